@@ -1,6 +1,8 @@
 import sys
 import os
 
+import pytest
+
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
@@ -32,3 +34,13 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_storage(tmp_path_factory):
+    # Тесты очищают кэш и считают запросы, поэтому работают с временными
+    # кэшем и метриками.
+    from yatube.test_runner import override_storage
+
+    with override_storage(str(tmp_path_factory.mktemp('cache'))):
+        yield
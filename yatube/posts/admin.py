@@ -1,33 +1,64 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import SEARCH_VAR
 
 from .models import Comment, Group, Follow, Post
+from .paginator import EstimatedCountPaginator
+from .search import get_rank, search_posts
 
 
 EMPTY_VALUE = '-пусто-'
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """Base admin for tables too big for exact counts and select lists."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = EMPTY_VALUE
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     """Represents the model Post in admin interface."""
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = EMPTY_VALUE
+    autocomplete_fields = ('author', 'group')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_posts(queryset, search_term), False
+
+    def get_ordering(self, request):
+        # Found posts are listed the most relevant first unless sorted by
+        # a column.
+        query = request.GET.get(SEARCH_VAR, '')
+        rank = get_rank(query) if query.strip() else None
+        if rank is None:
+            return super().get_ordering(request)
+        return (rank.asc(),)
 
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
     """Represents the model Group in admin interface."""
     list_display = ('pk', 'title', 'slug', 'description')
+    search_fields = ('title', 'slug')
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     """Represents the model Comment in admin interface."""
     list_display = ('pk', 'text', 'author', 'post', 'created')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author',)
+    raw_id_fields = ('post',)
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     """Represents the model Follow in admin interface."""
-    list_display = ('pk', 'user', 'author')
+    list_display = ('pk', 'user', 'author', 'fan_out')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,270 @@
+"""Posts app JSON API file
+
+Feeds are read as ``values()`` rows and written straight to JSON, neither
+``Post`` instances nor templates are made. Pages are addressed by the same
+``?after=`` and ``?before=`` cursors as the HTML feeds and are validated
+the same way, so a client polling an unchanged page gets a 304 without the
+page being read.
+
+``orjson`` is used to encode responses when it is installed.
+"""
+import json
+from datetime import datetime
+from http import HTTPStatus
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse
+
+from .conditional import (POSTS_SCOPE, get_group_scope, get_post_scope,
+                          get_user_scope, respond_conditional)
+from .models import Comment, Group, Post, TimelineEntry, User
+from .paginator import CursorPaginator
+from .timeline import get_merged_posts, merge_rows
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+PAGINATE_BY = settings.PAGINATE_BY
+COMMENTS_PAGINATE_BY = settings.COMMENTS_PAGINATE_BY
+POST_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'updated',
+    'comment_count',
+    'image',
+    'author__username',
+    'group__slug',
+)
+TIMELINE_FIELDS = ('pub_date', 'post_id') + tuple(
+    f'post__{field}' for field in POST_FIELDS
+)
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+CONTENT_TYPE = 'application/json'
+LOGIN_REQUIRED = 'Нужна авторизация.'
+
+
+def encode_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Encodes data to JSON bytes, datetimes in ISO 8601."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        separators=(',', ':'),
+        default=encode_default
+    ).encode()
+
+
+def get_post(row, prefix=''):
+    """Returns API representation of post's ``values()`` row."""
+    image = row[f'{prefix}image']
+    return {
+        'id': row[f'{prefix}id'],
+        'text': row[f'{prefix}text'],
+        'pub_date': row[f'{prefix}pub_date'],
+        'updated': row[f'{prefix}updated'],
+        'author': row[f'{prefix}author__username'],
+        'group': row[f'{prefix}group__slug'],
+        'image': default_storage.url(image) if image else None,
+        'comment_count': row[f'{prefix}comment_count'],
+    }
+
+
+def get_first(rows):
+    """Returns the first ``values()`` row or raises Http404."""
+    for row in rows[:1]:
+        return row
+    raise Http404
+
+
+def respond(request, get_data, scopes, *extra):
+    """Returns JSON of ``get_data()`` unless the client has the same page."""
+    return respond_conditional(
+        request,
+        lambda: HttpResponse(dumps(get_data()), content_type=CONTENT_TYPE),
+        scopes,
+        *extra
+    )
+
+
+def respond_feed(request, post_list, scopes, **data):
+    """Returns a page of ``post_list`` with cursors to its neighbours."""
+    def get_data():
+        paginator = CursorPaginator(
+            post_list.values(*POST_FIELDS),
+            PAGINATE_BY,
+            fields=('pub_date', 'id')
+        )
+        page = paginator.get_cursor_page(
+            request.GET.get('after'),
+            request.GET.get('before')
+        )
+        return {
+            **data,
+            'previous': paginator.previous_cursor,
+            'next': paginator.next_cursor,
+            'results': [get_post(row) for row in page],
+        }
+
+    return respond(request, get_data, scopes, *data.values())
+
+
+def index(request):
+    """Returns a page of all posts."""
+    return respond_feed(request, Post.objects.all(), (POSTS_SCOPE,))
+
+
+def group_posts(request, slug):
+    """Returns a page of the group's posts."""
+    group = get_first(
+        Group.objects.filter(slug=slug).values(
+            'id',
+            'title',
+            'slug',
+            'description'
+        )
+    )
+    group_id = group.pop('id')
+    return respond_feed(
+        request,
+        Post.objects.filter(group_id=group_id),
+        (get_group_scope(group_id),),
+        group=group
+    )
+
+
+def profile(request, username):
+    """Returns a page of the user's posts."""
+    author = get_first(
+        User.objects.filter(username=username).values(
+            'id',
+            'username',
+            'first_name',
+            'last_name'
+        )
+    )
+    author_id = author.pop('id')
+    return respond_feed(
+        request,
+        Post.objects.filter(author_id=author_id),
+        (get_user_scope(author_id),),
+        author=author
+    )
+
+
+def get_follow_data(request):
+    """Returns a page of posts of authors whom user follow.
+
+    Works like ``timeline.get_follow_page`` on ``values()`` rows.
+    """
+    user = request.user
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    entries = CursorPaginator(
+        TimelineEntry.objects.filter(user=user).values(*TIMELINE_FIELDS),
+        PAGINATE_BY,
+        fields=('pub_date', 'post_id')
+    )
+    rows, has_previous, has_next = entries.get_rows(after, before)
+    sources = [
+        ([get_post(row, 'post__') for row in rows], has_previous, has_next)
+    ]
+    merged_posts = get_merged_posts(user)
+    if merged_posts is not None:
+        posts = CursorPaginator(
+            Post.objects.filter(merged_posts).values(
+                *POST_FIELDS
+            ),
+            PAGINATE_BY,
+            fields=('pub_date', 'id')
+        )
+        rows, has_previous, has_next = posts.get_rows(after, before)
+        sources.append(
+            ([get_post(row) for row in rows], has_previous, has_next)
+        )
+    paginator = CursorPaginator(
+        Post.objects.none(),
+        PAGINATE_BY,
+        fields=('pub_date', 'id')
+    )
+    page = paginator.make_page(
+        *merge_rows(
+            sources,
+            PAGINATE_BY,
+            before,
+            key=itemgetter('pub_date', 'id')
+        )
+    )
+    return {
+        'previous': paginator.previous_cursor,
+        'next': paginator.next_cursor,
+        'results': list(page),
+    }
+
+
+def follow_index(request):
+    """Returns a page of posts of authors whom user follow.
+
+    Anonymous clients get a 403 rather than a redirect to the login page.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponse(
+            dumps({'detail': LOGIN_REQUIRED}),
+            content_type=CONTENT_TYPE,
+            status=HTTPStatus.FORBIDDEN
+        )
+    # New posts of the followed authors don't change the user's scope.
+    return respond(
+        request,
+        lambda: get_follow_data(request),
+        (POSTS_SCOPE, get_user_scope(request.user.pk))
+    )
+
+
+def post_view(request, username, post_id):
+    """Returns post with a page of its comments."""
+    post = get_post(
+        get_first(
+            Post.objects.filter(
+                pk=post_id,
+                author__username=username
+            ).values(*POST_FIELDS)
+        )
+    )
+
+    def get_data():
+        paginator = CursorPaginator(
+            Comment.objects.filter(post_id=post['id']).values(
+                *COMMENT_FIELDS
+            ),
+            COMMENTS_PAGINATE_BY,
+            fields=('created', 'id')
+        )
+        page = paginator.get_cursor_page(request.GET.get('after'))
+        return {
+            'post': post,
+            'next': paginator.next_cursor,
+            'comments': [
+                {
+                    'id': row['id'],
+                    'text': row['text'],
+                    'created': row['created'],
+                    'author': row['author__username'],
+                }
+                for row in page
+            ],
+        }
+
+    return respond(request, get_data, (get_post_scope(post['id']),))
@@ -0,0 +1,163 @@
+"""Posts app bulk loading file
+
+Rows are written without making model instances: PostgreSQL gets them by
+``COPY``, other databases by one ``executemany`` per batch. Model signals
+don't fire for such rows, so the ``catch_up_*`` functions do their work
+for everything loaded after a primary key watermark: search index, follower
+timelines, comment counters, the feed cache and the page ETags. Images of
+loaded posts are left to the ``generate_thumbnails`` command.
+
+The watermark assumes nothing else writes to the tables during the load.
+"""
+import csv
+from collections import defaultdict
+from io import StringIO
+
+from django.db import connections
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .cache import bump_content_version, bump_feed_version
+from .models import Comment, Follow, Post, TimelineEntry
+from .search import index_posts
+from .timeline import TIMELINE_FANOUT_LIMIT, backfill_timeline
+
+
+BATCH_SIZE = 1000
+COPY_NULL = r'\N'
+
+
+def get_watermark(model):
+    """Returns the largest primary key in model's table."""
+    return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+
+def insert_rows(model, rows):
+    """Writes ``{attname: value}`` dicts to model's table.
+
+    Every row must have a value of every concrete field but the primary
+    key, defaults are not filled in.
+    """
+    if not rows:
+        return
+    # The connection itself, not the proxy looking it up on every access.
+    connection = connections[model.objects.db]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    values = [
+        [
+            field.get_db_prep_save(row[field.attname], connection)
+            for field in fields
+        ]
+        for row in rows
+    ]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            content = StringIO()
+            csv.writer(content).writerows(
+                [COPY_NULL if value is None else value for value in row]
+                for row in values
+            )
+            content.seek(0)
+            cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN '
+                f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                content
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(
+                f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+                values
+            )
+
+
+def assign_fan_out(rows):
+    """Sets ``fan_out`` of new follow rows the way ``should_fan_out`` does."""
+    counts = dict(
+        Follow.objects.filter(
+            author_id__in={row['author_id'] for row in rows},
+            fan_out=True
+        ).order_by().values('author_id').annotate(
+            count=Count('pk')
+        ).values_list('author_id', 'count')
+    )
+    for row in rows:
+        count = counts.get(row['author_id'], 0)
+        row['fan_out'] = count < TIMELINE_FANOUT_LIMIT
+        if row['fan_out']:
+            counts[row['author_id']] = count + 1
+
+
+def catch_up_posts(after_pk):
+    """Indexes posts loaded after ``after_pk``, delivers them to timelines."""
+    posts = Post.objects.order_by('pk').values_list(
+        'pk',
+        'text',
+        'author_id',
+        'pub_date'
+    )
+    last_pk = after_pk
+    while True:
+        rows = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not rows:
+            break
+        index_posts((pk, text) for pk, text, _, _ in rows)
+        followers = defaultdict(list)
+        for author_id, user_id in Follow.objects.filter(
+            author_id__in={author_id for _, _, author_id, _ in rows},
+            fan_out=True
+        ).values_list('author_id', 'user_id'):
+            followers[author_id].append(user_id)
+        # The posts are new, none of them is in a timeline yet.
+        insert_rows(TimelineEntry, [
+            {
+                'user_id': user_id,
+                'post_id': pk,
+                'author_id': author_id,
+                'pub_date': pub_date,
+            }
+            for pk, _, author_id, pub_date in rows
+            for user_id in followers[author_id]
+        ])
+        last_pk = rows[-1][0]
+    bump_feed_version()
+
+
+def catch_up_comments(after_pk):
+    """Recounts comments of the posts commented after ``after_pk``."""
+    counts = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(count=Count('pk')).values('count')
+    Post.objects.filter(
+        pk__in=Comment.objects.filter(pk__gt=after_pk).values('post_id')
+    ).update(comment_count=Subquery(counts), updated=timezone.now())
+
+
+def catch_up_follows(after_pk):
+    """Fills the timelines of fan-out follows loaded after ``after_pk``."""
+    follows = Follow.objects.filter(pk__gt=after_pk, fan_out=True).only(
+        'user',
+        'author'
+    )
+    for follow in follows.iterator(chunk_size=BATCH_SIZE):
+        backfill_timeline(follow)
+
+
+CATCH_UP = {
+    Post: catch_up_posts,
+    Comment: catch_up_comments,
+    Follow: catch_up_follows,
+}
+
+
+def catch_up(model, after_pk):
+    """Does the work of model's signals for rows loaded after ``after_pk``."""
+    if model in CATCH_UP:
+        CATCH_UP[model](after_pk)
+    bump_content_version()
@@ -0,0 +1,183 @@
+"""Posts app feed cache file"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+
+from .models import Post
+from .paginator import CursorPaginator, normalize_cursor
+
+
+PAGINATE_BY = settings.PAGINATE_BY
+FEED_CACHE_TIMEOUT = settings.FEED_CACHE_TIMEOUT
+CACHE_STALE_TIMEOUT = settings.CACHE_STALE_TIMEOUT
+CACHE_LOCK_TIMEOUT = settings.CACHE_LOCK_TIMEOUT
+FEED_VERSION_KEY = 'feed_version'
+CONTENT_VERSION_KEY = 'content_version'
+EARLY_REFRESH_BETA = 1.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_version(key):
+    """Returns current value of the version counter stored under key."""
+    version = cache.get(key)
+    if version is None:
+        # A timestamp never collides with a version used before the key
+        # was evicted, so stale pages can't be picked up again.
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """Changes the version counter stored under key."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_feed_version():
+    """Returns current version of the home feed cache."""
+    return get_version(FEED_VERSION_KEY)
+
+
+def bump_feed_version():
+    """Invalidates every cached page of the home feed."""
+    bump_version(FEED_VERSION_KEY)
+
+
+def content_version_key(scope=None):
+    if scope is None:
+        return CONTENT_VERSION_KEY
+    return f'{CONTENT_VERSION_KEY}:{scope}'
+
+
+def get_content_version(*scopes):
+    """Returns versions of the rows of scopes and of all rows."""
+    keys = [content_version_key()]
+    keys.extend(content_version_key(scope) for scope in scopes)
+    versions = cache.get_many(keys)
+    return [
+        versions[key] if key in versions else get_version(key)
+        for key in keys
+    ]
+
+
+def bump_content_version(*scopes):
+    """Changes the ETag of pages showing scopes, of every page if none."""
+    for scope in scopes or (None,):
+        bump_version(content_version_key(scope))
+
+
+def feed_key(*parts):
+    return ':'.join(str(part) for part in ('feed',) + parts)
+
+
+def is_fresh(expires, delta, now):
+    """Tells if entry may be served without refresh.
+
+    The closer the expiry and the longer the value takes to compute, the
+    more likely a reader refreshes it early, so usually a single request
+    recomputes the value before it expires for everybody.
+    """
+    gap = -delta * EARLY_REFRESH_BETA * math.log(1 - random.random())
+    return now + gap < expires
+
+
+def get_or_compute(key, compute, version=None, timeout=FEED_CACHE_TIMEOUT):
+    """Returns cached result of ``compute()`` protected from stampedes.
+
+    Entries are kept for ``CACHE_STALE_TIMEOUT`` after they expire or their
+    ``version`` goes out of date. Only the request holding the refresh lock
+    of the key recomputes the value, others keep getting the stale one
+    meanwhile, or wait for the lock holder when there is nothing to serve.
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, entry_version, expires, delta = entry
+        if entry_version == version and is_fresh(expires, delta, time.time()):
+            return value
+        if not cache.add(lock_key, True, CACHE_LOCK_TIMEOUT):
+            return value
+    elif not cache.add(lock_key, True, CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # The lock holder died or is too slow, compute the value ourselves.
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        cache.set(
+            key,
+            (value, version, finished + timeout, finished - started),
+            timeout + CACHE_STALE_TIMEOUT
+        )
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def hydrate(post_list, ids):
+    """Loads posts with given ids keeping the order of ids."""
+    posts = post_list.in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def get_index_page(params):
+    """Returns a page of the home feed requested by query ``params``.
+
+    Only the ordered ids of the page and the data needed to link its
+    neighbours are cached, so the cache stays small however many posts there
+    are. The posts themselves are loaded by primary key.
+    """
+    post_list = Post.objects.select_related('author', 'group')
+    version = get_feed_version()
+    if 'page' in params:
+        return get_numbered_page(post_list, version, params.get('page'))
+    after = normalize_cursor(params.get('after'))
+    before = normalize_cursor(params.get('before'))
+    paginator = CursorPaginator(post_list, PAGINATE_BY)
+    rows = []
+
+    def compute():
+        rows.extend(paginator.get_cursor_page(after, before))
+        return (
+            [post.pk for post in rows],
+            paginator.previous_cursor,
+            paginator.next_cursor,
+        )
+
+    key = feed_key('cursor', after or '', before or '')
+    ids, previous_cursor, next_cursor = get_or_compute(key, compute, version)
+    if rows:
+        return Page(rows, 1, paginator)
+    paginator.previous_cursor = previous_cursor
+    paginator.next_cursor = next_cursor
+    return Page(hydrate(post_list, ids), 1, paginator)
+
+
+def get_numbered_page(post_list, version, page_number):
+    """Returns a page of the home feed for old ``?page=`` links."""
+    paginator = Paginator(post_list, PAGINATE_BY)
+    paginator.count = get_or_compute(
+        feed_key('count'),
+        lambda: Paginator(post_list, PAGINATE_BY).count,
+        version
+    )
+    page = paginator.get_page(page_number)
+    ids = get_or_compute(
+        feed_key('page', page.number),
+        lambda: list(page.object_list.values_list('pk', flat=True)),
+        version
+    )
+    return Page(hydrate(post_list, ids), page.number, paginator)
@@ -0,0 +1,77 @@
+"""Posts app conditional GET file
+
+Pages are validated by the viewer, the requested URL and the versions of
+the scopes of rows the page shows: all posts for the home feed, a group's
+posts, a user's posts and follows, a post and its comments. A change of a
+row changes only the versions of its scopes, bulk writes change the version
+of all rows. The ETag is known before the page is built, so a matching
+``If-None-Match`` gets a 304 response without querying the posts or
+rendering the template.
+
+No ``Last-Modified`` is sent: deleting a post or pushing it off a page
+doesn't make any of the shown posts newer.
+"""
+import hashlib
+
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .cache import get_content_version
+
+
+POSTS_SCOPE = 'posts'
+
+
+def get_user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def get_group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def get_post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def get_post_scopes(post_id, author_id, *group_ids):
+    """Returns scopes of the pages showing post or its counters."""
+    return (
+        POSTS_SCOPE,
+        get_post_scope(post_id),
+        get_user_scope(author_id),
+        *{get_group_scope(group_id) for group_id in group_ids if group_id},
+    )
+
+
+def get_etag(request, scopes, *extra):
+    """Returns ETag of the page requested by request showing scopes."""
+    user = request.user
+    parts = [
+        user.pk if user.is_authenticated else None,
+        request.get_full_path(),
+        get_content_version(*scopes),
+        *extra,
+    ]
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def respond_conditional(request, respond, scopes, *extra):
+    """Returns ``respond()`` unless the client already has the same page."""
+    etag = get_etag(request, scopes, *extra)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    return response
+
+
+def render_conditional(request, template_name, get_context, scopes, *extra):
+    """Renders template with ``get_context()`` unless the client has it."""
+    return respond_conditional(
+        request,
+        lambda: render(request, template_name, get_context()),
+        scopes,
+        *extra
+    )
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import BROKEN_IMAGE, ingest_image, make_placeholder
 from .models import Comment, Post
 
 
@@ -8,6 +11,16 @@ POST_HELP_TEXTS = {
     'group': 'Выберите сообщество',
     'image': 'Загрузите изображение',
 }
+# Fields an edit writes, the counters and image variants are changed by
+# other requests and tasks meanwhile.
+POST_EDIT_FIELDS = (
+    'text',
+    'group',
+    'image',
+    'image_placeholder',
+    'image_placeholder_source',
+    'updated',
+)
 COMMENT_HELP_TEXTS = {
     'text': 'Введите текст комментария'
 }
@@ -19,6 +32,34 @@ class PostForm(forms.ModelForm):
         fields = ['text', 'group', 'image']
         help_texts = POST_HELP_TEXTS
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = ingest_image(image)
+            try:
+                placeholder = make_placeholder(image)
+            except (OSError, ValueError):
+                raise ValidationError(BROKEN_IMAGE, code='broken_image')
+            self.instance.image_placeholder = placeholder
+        elif not image:
+            self.instance.image_placeholder = ''
+            self.instance.image_placeholder_source = ''
+        return image
+
+    def save(self, commit=True):
+        adding = self.instance._state.adding
+        post = super().save(commit=False)
+        image = post.image
+        if image and not image._committed:
+            # The placeholder belongs to the name the upload is stored under,
+            # which the storage picks.
+            image.save(image.name, image.file, save=False)
+            post.image_placeholder_source = image.name
+        if commit:
+            post.save(update_fields=None if adding else POST_EDIT_FIELDS)
+            self._save_m2m()
+        return post
+
 
 class CommentForm(forms.ModelForm):
     text = forms.CharField(widget=forms.Textarea)
@@ -0,0 +1,157 @@
+"""Posts app image ingestion file
+
+Uploaded images are checked by their headers before any pixel is decoded,
+then downscaled to ``IMAGE_MAX_SIZE`` and stored without EXIF and other
+metadata. JPEG images are decoded right at a reduced scale (``draft``),
+other formats are shrunk by ``reduce`` before the final resampling, so the
+full-size bitmap of a large photo is never kept in memory.
+
+A tiny preview of the image is made along the way and inlined in the card
+as a data URI, so something shows up before the real image loads.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+
+IMAGE_MAX_SIZE = settings.IMAGE_MAX_SIZE
+IMAGE_MAX_PIXELS = settings.IMAGE_MAX_PIXELS
+REDUCING_GAP = 3.0
+ORIENTATION_TAG = 0x0112
+TRANSPOSE_METHODS = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+# Format of images Pillow can't write back in their own.
+FALLBACK_FORMAT = 'PNG'
+PNG_MODES = ('1', 'L', 'LA', 'P', 'RGB', 'RGBA', 'I')
+PLACEHOLDER_SIZE = (32, 11)
+PLACEHOLDER_QUALITY = 40
+TOO_MANY_PIXELS = (
+    'Изображение слишком большое: не больше %(limit)s мегапикселей.'
+)
+BROKEN_IMAGE = 'Не удалось обработать изображение.'
+
+
+def get_output_format(image):
+    """Returns the format to re-encode image in, one Pillow can write."""
+    if image.format == 'MPO':
+        # Browsers show only the first picture of a stereo photo anyway.
+        return 'JPEG'
+    Image.init()
+    if image.format in Image.SAVE:
+        return image.format
+    return FALLBACK_FORMAT
+
+
+def shrink(image):
+    image.thumbnail(
+        (IMAGE_MAX_SIZE, IMAGE_MAX_SIZE),
+        Image.LANCZOS,
+        reducing_gap=REDUCING_GAP
+    )
+    return image
+
+
+def shrink_frames(image):
+    """Returns the first frame and save options of the others, downscaled."""
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 0))
+        frames.append(shrink(frame.copy()))
+    return frames[0], {
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+        'loop': image.info.get('loop', 0),
+    }
+
+
+def encode(image):
+    """Returns image downscaled without metadata and the format encoded in."""
+    image_format = get_output_format(image)
+    orientation = image.getexif().get(ORIENTATION_TAG)
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if getattr(image, 'is_animated', False) and image.format == image_format:
+        image, frame_options = shrink_frames(image)
+        options.update(frame_options)
+    else:
+        image = shrink(image)
+    if orientation in TRANSPOSE_METHODS:
+        image = image.transpose(TRANSPOSE_METHODS[orientation])
+    if image_format == FALLBACK_FORMAT and image.mode not in PNG_MODES:
+        image = image.convert('RGBA')
+    content = BytesIO()
+    image.save(content, image_format, **options)
+    return content.getvalue(), image_format
+
+
+def ingest_image(upload):
+    """Returns upload downscaled and stripped of metadata.
+
+    The upload is returned as is if it is small enough and carries no
+    metadata. Every frame of an animated image is downscaled. Images in
+    formats Pillow can read but not write are re-encoded as PNG.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            TOO_MANY_PIXELS,
+            code='too_many_pixels',
+            params={'limit': IMAGE_MAX_PIXELS // 1000000},
+        )
+    oversized = max(width, height) > IMAGE_MAX_SIZE
+    has_metadata = any(key in image.info for key in METADATA_KEYS)
+    if not (oversized or has_metadata):
+        upload.seek(0)
+        return upload
+    source_format = image.format
+    try:
+        content, image_format = encode(image)
+    except (KeyError, OSError, ValueError):
+        # Pixels are decoded only now, a truncated or corrupt file fails here.
+        raise ValidationError(BROKEN_IMAGE, code='broken_image')
+    name, content_type = upload.name, upload.content_type
+    if image_format == FALLBACK_FORMAT != source_format:
+        name = f'{os.path.splitext(name)[0]}.png'
+        content_type = Image.MIME[FALLBACK_FORMAT]
+    return SimpleUploadedFile(
+        name=name,
+        content=content,
+        content_type=content_type
+    )
+
+
+def make_placeholder(file):
+    """Returns data URI of a tiny preview of image cropped to card ratio."""
+    file.seek(0)
+    image = Image.open(file)
+    width, height = PLACEHOLDER_SIZE
+    image.draft('RGB', (width * 4, height * 4))
+    image = ImageOps.fit(image.convert('RGB'), PLACEHOLDER_SIZE, Image.BOX)
+    content = BytesIO()
+    image.save(content, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    file.seek(0)
+    encoded = base64.b64encode(content.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
@@ -0,0 +1,104 @@
+"""Posts app thumbnail key-value store file
+
+sorl-thumbnail looks every thumbnail up in its key-value store. The store
+below keeps the entries found in a bounded in-process LRU in front of the
+shared cache and the database, and can resolve the thumbnails of a whole
+page with one cache round-trip.
+
+Only existing entries are kept in the LRU: a thumbnail generated by another
+process shows up on the next lookup. Thumbnail names derive from the source
+name and options, so an entry never points to a different image.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+THUMBNAIL_LRU_SIZE = settings.THUMBNAIL_LRU_SIZE
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Cached database store with an in-process LRU in front."""
+
+    def __init__(self):
+        super().__init__()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recall(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > THUMBNAIL_LRU_SIZE:
+                self._entries.popitem(last=False)
+
+    def _forget(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        self._forget(*keys)
+
+    def clear(self, *args, **kwargs):
+        super().clear(*args, **kwargs)
+        with self._lock:
+            self._entries.clear()
+
+    def preload(self, image_files):
+        """Loads entries of ``image_files`` into the LRU at once.
+
+        Entries missing in the LRU are taken from the cache by one
+        ``get_many``, the rest from the database by one query.
+        """
+        keys = [
+            add_prefix(image_file.key) for image_file in image_files
+            if self._recall(add_prefix(image_file.key)) is None
+        ]
+        if not keys:
+            return
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key',
+                    'value'
+                )
+            )
+            # Absent entries are cached as empty like single lookups do.
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched,
+                thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        for key, value in values.items():
+            if value != EMPTY_VALUE:
+                self._remember(key, value)
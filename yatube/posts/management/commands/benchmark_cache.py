@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'yatube.cache.SQLiteCache',
+}
+WORKERS = [1, 2, 4, 8, 16]
+OPERATIONS = 2000
+KEYS = 1000
+PAYLOAD_SIZE = 1024
+
+
+def run_worker(backend, location, seed, operations, keys, payload_size):
+    """Reads skewed keys and writes the missing ones like a view would."""
+    cache = import_string(BACKENDS[backend])(location, {
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': keys * 2},
+    })
+    rng = random.Random(seed)
+    payload = os.urandom(payload_size)
+    hits = 0
+    latencies = []
+    for _ in range(operations):
+        key = f'key_{int(keys * rng.random() ** 2)}'
+        started = time.perf_counter()
+        if cache.get(key) is None:
+            cache.set(key, payload)
+        else:
+            hits += 1
+        latencies.append(time.perf_counter() - started)
+    return hits, latencies
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает долю попаданий и задержки кэша locmem и общего '
+        'SQLite-кэша при разном числе процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=WORKERS,
+            help='Числа процессов, для которых выполняется замер.'
+        )
+        parser.add_argument('--operations', type=int, default=OPERATIONS)
+        parser.add_argument('--keys', type=int, default=KEYS)
+        parser.add_argument('--payload-size', type=int, default=PAYLOAD_SIZE)
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            choices=sorted(BACKENDS),
+            default=sorted(BACKENDS)
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"backend":<8} {"workers":>7} {"hit rate":>9} '
+            f'{"p50, us":>9} {"p99, us":>9} {"ops/s":>10}'
+        )
+        for backend in options['backends']:
+            for workers in options['workers']:
+                directory = tempfile.mkdtemp()
+                location = os.path.join(directory, 'cache.sqlite3')
+                arguments = [
+                    (
+                        backend,
+                        location,
+                        seed,
+                        options['operations'],
+                        options['keys'],
+                        options['payload_size'],
+                    )
+                    for seed in range(workers)
+                ]
+                started = time.perf_counter()
+                with context.Pool(workers) as pool:
+                    results = pool.starmap(run_worker, arguments)
+                elapsed = time.perf_counter() - started
+                shutil.rmtree(directory, ignore_errors=True)
+                self.report(backend, workers, results, elapsed)
+
+    def report(self, backend, workers, results, elapsed):
+        hits = sum(worker_hits for worker_hits, _ in results)
+        latencies = sorted(
+            latency for _, worker_latencies in results
+            for latency in worker_latencies
+        )
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[len(latencies) * 99 // 100]
+        self.stdout.write(
+            f'{backend:<8} {workers:>7} {hits / len(latencies):>9.1%} '
+            f'{p50 * 1e6:>9.1f} {p99 * 1e6:>9.1f} '
+            f'{len(latencies) / elapsed:>10.0f}'
+        )
@@ -0,0 +1,122 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts.models import Post, User
+from posts.thumbnails import THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS, backend
+
+
+STORES = {
+    'cached_db': 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore',
+    'lru': 'posts.kvstore.KVStore',
+}
+POSTS = settings.PAGINATE_BY
+REPEAT = 50
+SOURCE_SIZE = (1000, 400)
+THUMBNAIL_SIZE = (960, 339)
+FEED = Template(
+    '{% load post_thumbnails %}'
+    '{% preload_post_images posts %}'
+    '{% for post in posts %}{% post_image post %}{% endfor %}'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время и число запросов отрисовки изображений страницы '
+        'ленты с хранилищем миниатюр sorl по умолчанию и с LRU перед кэшем. '
+        'Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=POSTS)
+        parser.add_argument('--repeat', type=int, default=REPEAT)
+
+    def handle(self, *args, **options):
+        stored_kvstore = default.kvstore._wrapped
+        self.stdout.write(
+            f'{"store":<10} {"cache":<5} {"median, ms":>10} {"queries":>8}'
+        )
+        try:
+            with transaction.atomic():
+                posts = self.seed(options['posts'])
+                for name, path in STORES.items():
+                    default.kvstore._wrapped = import_string(path)()
+                    self.register(posts)
+                    self.measure(name, 'cold', posts, options['repeat'])
+                    self.measure(name, 'warm', posts, options['repeat'])
+                    self.forget(posts, sources=True)
+                transaction.set_rollback(True)
+        finally:
+            default.kvstore._wrapped = stored_kvstore
+
+    def seed(self, count):
+        """Creates posts whose single thumbnails are in the store only."""
+        author = User.objects.create(username='benchmark_render')
+        Post.objects.bulk_create(
+            Post(
+                text=f'Текст поста {number}',
+                author=author,
+                image=f'posts/benchmark_{number}.jpg'
+            )
+            for number in range(count)
+        )
+        return list(Post.objects.filter(author=author))
+
+    def register(self, posts):
+        kvstore = default.kvstore
+        for post in posts:
+            source = ImageFile(post.image)
+            source.set_size(SOURCE_SIZE)
+            kvstore.set(source)
+            thumbnail = self.get_thumbnail_file(post)
+            thumbnail.set_size(THUMBNAIL_SIZE)
+            kvstore.set(thumbnail, source)
+
+    def get_thumbnail_file(self, post):
+        return backend.get_thumbnail_file(
+            post.image,
+            THUMBNAIL_GEOMETRY,
+            **THUMBNAIL_OPTIONS
+        )
+
+    def forget(self, posts, sources=False):
+        """Drops the thumbnails of ``posts`` from every cache layer."""
+        kvstore = default.kvstore._wrapped
+        keys = [
+            add_prefix(self.get_thumbnail_file(post).key) for post in posts
+        ]
+        if sources:
+            for post in posts:
+                source = ImageFile(post.image)
+                keys.append(add_prefix(source.key))
+                keys.append(add_prefix(source.key, 'thumbnails'))
+        kvstore.cache.delete_many(keys)
+        if hasattr(kvstore, '_forget'):
+            kvstore._forget(*keys)
+
+    def measure(self, name, mode, posts, repeat):
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            if mode == 'cold':
+                self.forget(posts)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                FEED.render(Context({'posts': posts}))
+                timings.append(time.perf_counter() - started)
+            queries += len(captured)
+        timings.sort()
+        self.stdout.write(
+            f'{name:<10} {mode:<5} '
+            f'{timings[len(timings) // 2] * 1000:>10.2f} '
+            f'{queries / repeat:>8.1f}'
+        )
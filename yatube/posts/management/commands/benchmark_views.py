@@ -0,0 +1,411 @@
+import json
+import platform
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from socketserver import ThreadingMixIn
+from unittest import mock
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from about.urls import urlpatterns as about_urlpatterns
+from posts.models import Follow, Group, Post, User
+from posts.urls import urlpatterns as posts_urlpatterns
+
+
+REQUESTS = 50
+CONCURRENCY = 4
+WARMUP = 3
+THRESHOLD = 0.2
+QUERY_TOLERANCE = 0
+TRANSPORTS = ('client', 'wsgi')
+# Routes changing data on GET are not driven.
+SKIPPED = {'profile_follow', 'profile_unfollow'}
+ROLES = ('guest', 'user')
+PROBE_HEADERS = {
+    'queries': 'X-Benchmark-Queries',
+    'hits': 'X-Benchmark-Cache-Hits',
+    'misses': 'X-Benchmark-Cache-Misses',
+}
+MISSING = object()
+
+
+class Probe(threading.local):
+    """Counts queries and cache lookups of the request in this thread."""
+
+    def reset(self):
+        self.queries = self.hits = self.misses = 0
+
+
+probe = Probe()
+
+
+def count_query(execute, sql, params, many, context):
+    probe.queries += 1
+    return execute(sql, params, many, context)
+
+
+def count_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, MISSING, version)
+        if value is MISSING:
+            probe.misses += 1
+            return default
+        probe.hits += 1
+        return value
+    return wrapper
+
+
+def count_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        values = get_many(self, keys, version)
+        probe.hits += len(values)
+        probe.misses += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def probed(application):
+    """Wraps WSGI application to report the counters in headers."""
+    def wrapper(environ, start_response):
+        probe.reset()
+
+        def probed_start_response(status, headers, *args):
+            headers = list(headers) + [
+                (header, str(getattr(probe, name)))
+                for name, header in PROBE_HEADERS.items()
+            ]
+            return start_response(status, headers, *args)
+
+        with connection.execute_wrapper(count_query):
+            return application(environ, probed_start_response)
+    return wrapper
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def percentile(values, share):
+    """Returns the value of sorted values below which ``share`` of them are."""
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает все страницы posts и about гостем и авторизованным '
+        'пользователем на заполненной базе (см. seed) и выводит задержки '
+        'p50/p95/p99, пропускную способность, число запросов к базе и долю '
+        'попаданий в кэш. Результаты сохраняются как базовые и сравниваются '
+        'с ними: замедление сверх порога завершает команду ошибкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=REQUESTS)
+        parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+        parser.add_argument('--warmup', type=int, default=WARMUP)
+        parser.add_argument(
+            '--transport',
+            choices=TRANSPORTS,
+            default='client',
+            help=(
+                'client - тестовый клиент Django в потоках, wsgi - запросы '
+                'по HTTP к локальному WSGI-серверу.'
+            )
+        )
+        parser.add_argument(
+            '--routes',
+            nargs='+',
+            help='Имена маршрутов, по умолчанию все.'
+        )
+        parser.add_argument('--save-baseline', help='Файл для результатов.')
+        parser.add_argument('--baseline', help='Файл базовых результатов.')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=THRESHOLD,
+            help='Допустимый рост p95 относительно базовых результатов.'
+        )
+        parser.add_argument(
+            '--query-tolerance',
+            type=int,
+            default=QUERY_TOLERANCE,
+            help=(
+                'Допустимый рост медианного числа запросов к базе '
+                'относительно базовых результатов.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        urls = self.get_urls(options['routes'])
+        user = self.get_user()
+        self.session = self.log_in(user)
+        results = {}
+        cache_class = type(caches['default'])
+        with ExitStack() as stack:
+            # Early refreshes of the feed cache are random, without them
+            # every warm request of a case makes the same queries.
+            stack.enter_context(
+                mock.patch('posts.cache.EARLY_REFRESH_BETA', 0)
+            )
+            stack.enter_context(mock.patch.object(
+                cache_class,
+                'get',
+                count_get(cache_class.get)
+            ))
+            # The inherited get_many looks keys up by the counted get.
+            if 'get_many' in vars(cache_class):
+                stack.enter_context(mock.patch.object(
+                    cache_class,
+                    'get_many',
+                    count_get_many(cache_class.get_many)
+                ))
+            if options['transport'] == 'wsgi':
+                server = self.start_server()
+                send = self.send_http
+            else:
+                server = None
+                send = self.send_client
+            try:
+                self.stdout.write(
+                    f'{"case":<24} {"p50, ms":>8} {"p95, ms":>8} '
+                    f'{"p99, ms":>8} {"req/s":>7} {"queries":>7} '
+                    f'{"cache":>6}'
+                )
+                for name, url in urls:
+                    for role in ROLES:
+                        case = f'{name}:{role}'
+                        results[case] = self.measure(
+                            send,
+                            url,
+                            role,
+                            options
+                        )
+                        self.report(case, results[case])
+            finally:
+                if server is not None:
+                    server.shutdown()
+                    server.server_close()
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline:
+                json.dump(
+                    {
+                        'transport': options['transport'],
+                        'concurrency': options['concurrency'],
+                        'python': platform.python_version(),
+                        'database': connection.vendor,
+                        'results': results,
+                    },
+                    baseline,
+                    indent=2,
+                    sort_keys=True
+                )
+        if options['baseline']:
+            self.compare(results, options)
+
+    def get_user(self):
+        """Returns the reader following the most authors."""
+        follow = Follow.objects.values('user').annotate(
+            follows=Count('pk')
+        ).order_by('-follows').first()
+        if follow is None:
+            raise CommandError('В базе нет подписок, выполните seed.')
+        return User.objects.get(pk=follow['user'])
+
+    def get_urls(self, routes):
+        """Returns ``(name, url)`` of every route filled with seeded data."""
+        post = Post.objects.filter(
+            author__in=Follow.objects.values('author').annotate(
+                followers=Count('pk')
+            ).order_by('-followers').values('author')[:1]
+        ).select_related('author').order_by('-pub_date').first()
+        group = Group.objects.annotate(
+            count=Count('posts')
+        ).order_by('-count').first()
+        if post is None or group is None:
+            raise CommandError(
+                'В базе нет постов или сообществ, выполните seed.'
+            )
+        values = {
+            'username': post.author.username,
+            'post_id': post.pk,
+            'slug': group.slug,
+        }
+        queries = {'search': '?' + urlencode({'q': post.text.split()[0]})}
+        urls = []
+        for namespace, patterns in (
+            ('', posts_urlpatterns),
+            ('about:', about_urlpatterns),
+        ):
+            for pattern in patterns:
+                name = f'{namespace}{pattern.name}'
+                if pattern.name in SKIPPED or routes and name not in routes:
+                    continue
+                kwargs = {
+                    key: values[key]
+                    for key in pattern.pattern.converters
+                }
+                urls.append((
+                    name,
+                    reverse(name, kwargs=kwargs)
+                    + queries.get(pattern.name, '')
+                ))
+        return urls
+
+    def log_in(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies
+
+    def start_server(self):
+        server = make_server(
+            '127.0.0.1',
+            0,
+            probed(get_wsgi_application()),
+            server_class=ThreadingWSGIServer,
+            handler_class=QuietHandler
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.server_url = f'http://127.0.0.1:{server.server_port}'
+        return server
+
+    def send_client(self, url, role):
+        """Requests url by test client, returns status and counters."""
+        local = self.local
+        if not hasattr(local, 'clients'):
+            local.clients = {'guest': Client(), 'user': Client()}
+            local.clients['user'].cookies = self.session
+        probe.reset()
+        with connection.execute_wrapper(count_query):
+            response = local.clients[role].get(url)
+        return response.status_code, probe.queries, probe.hits, probe.misses
+
+    def send_http(self, url, role):
+        """Requests url from the local server, returns status and counters."""
+        request = urllib.request.Request(self.server_url + url)
+        if role == 'user':
+            request.add_header('Cookie', self.session.output(
+                attrs=[],
+                header='',
+                sep=';'
+            ).strip())
+        opener = urllib.request.build_opener(NoRedirect)
+        try:
+            response = opener.open(request)
+        except urllib.error.HTTPError as error:
+            response = error
+        response.read()
+        return (
+            response.status,
+            *(
+                int(response.headers.get(header, 0))
+                for header in PROBE_HEADERS.values()
+            )
+        )
+
+    def measure(self, send, url, role, options):
+        """Requests url concurrently, returns its latency statistics."""
+        self.local = threading.local()
+
+        def run(_):
+            started = time.perf_counter()
+            status, queries, hits, misses = send(url, role)
+            return (
+                time.perf_counter() - started,
+                status,
+                queries,
+                hits,
+                misses
+            )
+
+        def close(_):
+            connections.close_all()
+
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            list(pool.map(run, range(options['warmup'])))
+            started = time.perf_counter()
+            samples = list(pool.map(run, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+            list(pool.map(close, range(options['concurrency'])))
+        latencies = sorted(sample[0] for sample in samples)
+        queries = sorted(sample[2] for sample in samples)
+        hits = sum(sample[3] for sample in samples)
+        lookups = hits + sum(sample[4] for sample in samples)
+        return {
+            'url': url,
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'throughput': len(samples) / elapsed,
+            'queries': percentile(queries, 0.5),
+            'cache_hit_rate': hits / lookups if lookups else None,
+            'statuses': sorted({sample[1] for sample in samples}),
+        }
+
+    def report(self, case, result):
+        hit_rate = result['cache_hit_rate']
+        self.stdout.write(
+            f'{case:<24} {result["p50"]:>8.1f} {result["p95"]:>8.1f} '
+            f'{result["p99"]:>8.1f} {result["throughput"]:>7.0f} '
+            f'{result["queries"]:>7.1f} '
+            f'{"-" if hit_rate is None else f"{hit_rate:.0%}":>6}'
+        )
+        if any(status >= 500 for status in result['statuses']):
+            self.stderr.write(f'{case}: ответы {result["statuses"]}')
+
+    def compare(self, results, options):
+        """Fails if a case got slower or makes more queries than baseline."""
+        with open(options['baseline']) as baseline:
+            baseline = json.load(baseline)
+        for option in ('transport', 'concurrency'):
+            if baseline[option] != options[option]:
+                raise CommandError(
+                    f'Базовые результаты сняты с --{option} '
+                    f'{baseline[option]}, сравнивать нельзя.'
+                )
+        threshold = options['threshold']
+        query_tolerance = options['query_tolerance']
+        baseline = baseline['results']
+        regressions = []
+        for case, result in results.items():
+            if case not in baseline:
+                continue
+            base = baseline[case]
+            if result['p95'] > base['p95'] * (1 + threshold):
+                regressions.append(
+                    f'{case}: p95 {base["p95"]:.1f} -> {result["p95"]:.1f} ms'
+                )
+            # The median ignores the few requests refilling the cache.
+            if result['queries'] > base['queries'] + query_tolerance:
+                regressions.append(
+                    f'{case}: запросов {base["queries"]:g} -> '
+                    f'{result["queries"]:g}'
+                )
+        if regressions:
+            raise CommandError(
+                'Страницы стали медленнее базовых результатов:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
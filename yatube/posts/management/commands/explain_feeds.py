@@ -0,0 +1,173 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.bulk import BATCH_SIZE, catch_up, get_watermark
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+POSTS = 20000
+AUTHORS = 200
+COMMENTS_PER_POST = 2
+REPEAT = 20
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+    'follow_author_fan_out_idx',
+)
+BIG_TABLES = (
+    'posts_post',
+    'posts_comment',
+    'posts_follow',
+    'posts_timelineentry',
+)
+# Plan lines telling that rows are sorted or a big table is read in full.
+SORT_STEPS = {
+    'postgresql': ('Sort',),
+    'sqlite': ('USE TEMP B-TREE',),
+}
+SCAN_STEPS = {
+    'postgresql': 'Seq Scan on {} ',
+    'sqlite': 'SCAN {} ',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу тестовыми данными и выводит планы и время '
+        'запросов лент с индексами лент и без них. Все изменения '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=POSTS)
+        parser.add_argument('--authors', type=int, default=AUTHORS)
+        parser.add_argument('--repeat', type=int, default=REPEAT)
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Сначала выполнить запросы без индексов лент.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seeded = self.seed(options['posts'], options['authors'])
+            if options['compare']:
+                self.stdout.write(self.style.MIGRATE_HEADING('Без индексов'))
+                with transaction.atomic():
+                    self.drop_indexes()
+                    self.explain(seeded, options['repeat'])
+                    transaction.set_rollback(True)
+                self.stdout.write(self.style.MIGRATE_HEADING('С индексами'))
+            self.explain(seeded, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, posts, authors):
+        User.objects.bulk_create(
+            User(username=f'explain_author_{number}')
+            for number in range(authors)
+        )
+        authors = list(
+            User.objects.filter(username__startswith='explain_author_')
+        )
+        group = Group.objects.create(
+            title='explain',
+            slug='explain_feeds',
+            description='explain'
+        )
+        reader = authors[0]
+        # Follows go first, so timelines are filled when the posts come.
+        self.load(Follow, (
+            Follow(user=reader, author=author) for author in authors[1:]
+        ))
+        self.load(Post, (
+            Post(
+                text=f'Текст поста {number}',
+                author=authors[number % len(authors)],
+                group=group if number % 2 else None,
+            )
+            for number in range(posts)
+        ))
+        post_ids = list(Post.objects.filter(
+            author__in=authors
+        ).values_list('pk', flat=True))
+        self.load(Comment, (
+            Comment(
+                text='Комментарий',
+                author=authors[number % len(authors)],
+                post_id=post_ids[number % len(post_ids)]
+            )
+            for number in range(COMMENTS_PER_POST * len(post_ids))
+        ))
+        post = Post.objects.filter(author=reader).first()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return reader, group, post
+
+    def load(self, model, objects):
+        """Creates objects doing the work their signals would do."""
+        watermark = get_watermark(model)
+        model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        catch_up(model, watermark)
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for name in FEED_INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+            cursor.execute('ANALYZE')
+
+    def get_queries(self, reader, group, post):
+        """Returns querysets the feeds run to show their first page."""
+        post_list = Post.objects.select_related('author', 'group')
+        order = ('-pub_date', '-pk')
+        return (
+            ('index', post_list.order_by(*order)[:11]),
+            ('group', post_list.filter(group=group).order_by(*order)[:11]),
+            ('profile', post_list.filter(author=reader).order_by(*order)[:11]),
+            (
+                'follow',
+                TimelineEntry.objects.filter(user=reader).order_by(
+                    '-pub_date', '-post_id'
+                )[:11]
+            ),
+            ('comments', post.comments.select_related('author')[:100]),
+            (
+                'followers',
+                Follow.objects.filter(author=reader, fan_out=True).values(
+                    'user_id'
+                )
+            ),
+        )
+
+    def explain(self, seeded, repeat):
+        options = {}
+        if connection.vendor == 'postgresql':
+            options = {'analyze': True}
+        slow_steps = SORT_STEPS.get(connection.vendor, ()) + tuple(
+            SCAN_STEPS[connection.vendor].format(table)
+            for table in BIG_TABLES if connection.vendor in SCAN_STEPS
+        )
+        for name, queryset in self.get_queries(*seeded):
+            plan = queryset.explain(**options)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            slow = any(
+                step in f'{line} ' and 'INDEX' not in line
+                for line in plan.splitlines() for step in slow_steps
+            )
+            status = (
+                self.style.ERROR('сортировка или полный просмотр') if slow
+                else self.style.SUCCESS('ok')
+            )
+            self.stdout.write(
+                f'{name}: {timings[len(timings) // 2] * 1000:.2f} ms, {status}'
+            )
+            self.stdout.write(plan)
+            self.stdout.write('')
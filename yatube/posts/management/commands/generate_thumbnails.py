@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import make_post_images
+
+
+CHUNK_SIZE = 16
+
+
+def generate(row):
+    """Makes image variants of one post in a pool process."""
+    pk, name = row
+    try:
+        return make_post_images(pk, name), None
+    except Exception as error:
+        return False, f'{name}: {error}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает недостающие варианты изображений постов в нескольких '
+        'процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов, по умолчанию по числу ядер.'
+        )
+
+    def handle(self, *args, **options):
+        rows = list(
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by('-pub_date').values_list('pk', 'image')
+        )
+        # Forked processes must open their own connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        generated = 0
+        with context.Pool(options['processes']) as pool:
+            results = pool.imap_unordered(generate, rows, CHUNK_SIZE)
+            for made, error in results:
+                generated += made
+                if error:
+                    self.stderr.write(error)
+        self.stdout.write(
+            f'Создано миниатюр: {generated}, '
+            f'всего изображений: {len(rows)}.'
+        )
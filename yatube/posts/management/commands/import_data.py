@@ -0,0 +1,298 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import (BATCH_SIZE, assign_fan_out, catch_up, get_watermark,
+                        insert_rows)
+from posts.models import Comment, Follow, Group, Post, User
+from posts.validators import find_empty
+
+
+MODELS = {
+    'users': User,
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+FORMATS = ('ndjson', 'csv')
+USER_KEYS = ('username', 'author', 'user')
+GROUP_KEYS = ('slug', 'group')
+
+
+class Rejected(Exception):
+    """Row can't be imported."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, сообщества, посты, комментарии или '
+        'подписки из NDJSON или CSV пачками. Авторы указываются username, '
+        'сообщества - slug. Строки без обязательных полей или со ссылками '
+        'на несуществующие объекты пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument('path', help='Файл, .gz распаковывается, - stdin.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        convert = getattr(self, f'convert_{options["model"]}')
+        self.user_ids = {}
+        self.group_ids = {}
+        self.follows = set()
+        self.now = timezone.now()
+        started = time.perf_counter()
+        imported = rejected = 0
+        with self.open(options['path']) as source:
+            rows = enumerate(
+                self.read(source, options['format'], options['path']),
+                start=1
+            )
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                converted = self.convert(batch, convert, model)
+                with transaction.atomic():
+                    watermark = get_watermark(model)
+                    insert_rows(model, converted)
+                    catch_up(model, watermark)
+                imported += len(converted)
+                rejected += len(batch) - len(converted)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено строк: {imported}, пропущено: {rejected}, '
+            f'{imported / elapsed if elapsed else 0:.0f} строк в секунду.'
+        )
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8', newline='')
+
+    def read(self, source, file_format, path):
+        """Yields rows of source as dicts, malformed ones as ``Rejected``."""
+        if file_format is None:
+            name = path[:-len('.gz')] if path.endswith('.gz') else path
+            file_format = 'csv' if name.endswith('.csv') else 'ndjson'
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield Rejected(f'неверный JSON: {error}')
+
+    def convert(self, batch, convert, model):
+        """Returns table rows made of input rows, reporting rejected ones."""
+        objects = []
+        for number, row in batch:
+            if isinstance(row, dict):
+                objects.append((number, row))
+            else:
+                self.reject(number, row if isinstance(row, Rejected) else (
+                    'строка не является объектом'
+                ))
+        rows = [row for _, row in objects]
+        self.prefetch(rows)
+        empty = set()
+        if model in (Post, Comment):
+            texts = [row.get('text') for row in rows]
+            empty.update(
+                position for position, text in enumerate(texts)
+                if not isinstance(text, str)
+            )
+            empty.update(find_empty(texts))
+        converted = []
+        for position, (number, row) in enumerate(objects):
+            try:
+                if position in empty:
+                    raise Rejected('пустой текст')
+                converted.append(convert(row))
+            except (Rejected, KeyError, TypeError, ValueError) as error:
+                self.reject(number, error)
+        if model is Follow:
+            assign_fan_out(converted)
+        return converted
+
+    def reject(self, number, error):
+        self.stderr.write(f'Строка {number} пропущена: {error}')
+
+    def prefetch(self, rows):
+        """Looks up ids of the users, groups and posts rows refer to."""
+        self.resolve(
+            self.user_ids,
+            User.objects.all(),
+            'username',
+            {
+                row[key] for row in rows for key in USER_KEYS
+                if isinstance(row.get(key), str)
+            }
+        )
+        self.resolve(
+            self.group_ids,
+            Group.objects.all(),
+            'slug',
+            {
+                row[key] for row in rows for key in GROUP_KEYS
+                if isinstance(row.get(key), str)
+            }
+        )
+        post_ids = set()
+        for row in rows:
+            if str(row.get('post', '')).isdigit():
+                post_ids.add(int(row['post']))
+        self.post_ids = set(
+            Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True)
+        ) if post_ids else set()
+        pairs = {
+            (self.user_ids.get(row['user']), self.user_ids.get(row['author']))
+            for row in rows
+            if isinstance(row.get('user'), str)
+            and isinstance(row.get('author'), str)
+        }
+        if pairs:
+            self.follows.update(
+                Follow.objects.filter(
+                    user_id__in={user_id for user_id, _ in pairs},
+                    author_id__in={author_id for _, author_id in pairs}
+                ).values_list('user_id', 'author_id')
+            )
+
+    def resolve(self, ids, queryset, field, values):
+        """Adds ids of the values missing from ``ids`` by one query."""
+        values = {value for value in values if value} - ids.keys()
+        if values:
+            ids.update(
+                queryset.filter(**{f'{field}__in': values}).values_list(
+                    field,
+                    'pk'
+                )
+            )
+
+    def get_user_id(self, username):
+        if not isinstance(username, str):
+            raise Rejected(f'неверный пользователь {username!r}')
+        if username not in self.user_ids:
+            raise Rejected(f'нет пользователя {username!r}')
+        return self.user_ids[username]
+
+    def get_group_id(self, slug):
+        if not slug:
+            return None
+        if not isinstance(slug, str):
+            raise Rejected(f'неверное сообщество {slug!r}')
+        if slug not in self.group_ids:
+            raise Rejected(f'нет сообщества {slug!r}')
+        return self.group_ids[slug]
+
+    def get_moment(self, value):
+        if not value:
+            return self.now
+        moment = parse_datetime(value)
+        if moment is None:
+            raise Rejected(f'неверная дата {value!r}')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def convert_users(self, row):
+        username = row['username']
+        if not isinstance(username, str):
+            raise Rejected(f'неверный username {username!r}')
+        if not username:
+            raise Rejected('пустой username')
+        if username in self.user_ids:
+            raise Rejected(f'пользователь {username!r} уже есть')
+        # The id is unknown until the batch is written.
+        self.user_ids[username] = None
+        return {
+            'password': make_password(None),
+            'last_login': None,
+            'is_superuser': False,
+            'username': username,
+            'first_name': row.get('first_name') or '',
+            'last_name': row.get('last_name') or '',
+            'email': row.get('email') or '',
+            'is_staff': False,
+            'is_active': True,
+            'date_joined': self.get_moment(row.get('date_joined')),
+        }
+
+    def convert_groups(self, row):
+        slug = row['slug']
+        if not isinstance(slug, str):
+            raise Rejected(f'неверный slug {slug!r}')
+        if not slug or not row['title']:
+            raise Rejected('пустой slug или заголовок')
+        if slug in self.group_ids:
+            raise Rejected(f'сообщество {slug!r} уже есть')
+        self.group_ids[slug] = None
+        return {
+            'title': row['title'],
+            'slug': slug,
+            'description': row.get('description') or '',
+        }
+
+    def convert_posts(self, row):
+        pub_date = self.get_moment(row.get('pub_date'))
+        return {
+            'text': row['text'],
+            'pub_date': pub_date,
+            'author_id': self.get_user_id(row['author']),
+            'group_id': self.get_group_id(row.get('group')),
+            'image': row.get('image') or '',
+            'image_placeholder': '',
+            'image_placeholder_source': '',
+            'image_variants': {},
+            'updated': pub_date,
+            'comment_count': 0,
+        }
+
+    def convert_comments(self, row):
+        post_id = int(row['post'])
+        if post_id not in self.post_ids:
+            raise Rejected(f'нет поста {post_id}')
+        return {
+            'post_id': post_id,
+            'author_id': self.get_user_id(row['author']),
+            'text': row['text'],
+            'created': self.get_moment(row.get('created')),
+        }
+
+    def convert_follows(self, row):
+        user_id = self.get_user_id(row['user'])
+        author_id = self.get_user_id(row['author'])
+        if user_id == author_id:
+            raise Rejected('подписка на себя')
+        if (user_id, author_id) in self.follows:
+            raise Rejected('подписка уже есть')
+        self.follows.add((user_id, author_id))
+        return {
+            'user_id': user_id,
+            'author_id': author_id,
+            'timeline_since': None,
+        }
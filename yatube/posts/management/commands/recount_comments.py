@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from posts.cache import bump_content_version
+from posts.models import Comment, Post
+
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики комментариев постов с таблицей комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество постов, проверяемых за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.select_for_update().filter(
+                        pk__gt=last_pk
+                    ).order_by('pk').only('pk', 'comment_count')[:batch_size]
+                )
+                if not posts:
+                    break
+                counts = dict(
+                    Comment.objects.filter(post__in=posts).order_by().values(
+                        'post'
+                    ).annotate(count=Count('pk')).values_list('post', 'count')
+                )
+                stale = []
+                now = timezone.now()
+                for post in posts:
+                    count = counts.get(post.pk, 0)
+                    if post.comment_count != count:
+                        post.comment_count = count
+                        # Cached cards are keyed by the modification time.
+                        post.updated = now
+                        stale.append(post)
+                Post.objects.bulk_update(stale, ['comment_count', 'updated'])
+            checked += len(posts)
+            fixed += len(stale)
+            last_pk = posts[-1].pk
+        if fixed:
+            # Pages showing the old counters are no longer valid.
+            bump_content_version()
+        self.stdout.write(
+            f'Проверено постов: {checked}, исправлено счетчиков: {fixed}.'
+        )
@@ -0,0 +1,292 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts.bulk import (BATCH_SIZE, assign_fan_out, catch_up, get_watermark,
+                        insert_rows)
+from posts.images import make_placeholder
+from posts.models import Comment, Follow, Group, Post, User
+
+
+USERS = 1000
+GROUPS = 20
+POSTS = 10000
+COMMENTS = 20000
+FOLLOWS = 10000
+IMAGE_RATIO = 0.2
+SKEW = 1.1
+DAYS = 365
+PASSWORD = 'yatube-seed'
+LOCALE = 'ru_RU'
+# Texts and images are drawn from small pools, making a sentence or a
+# picture per row would take longer than writing the rows.
+SENTENCES = 2000
+IMAGES = 12
+IMAGE_SIZE = (1200, 800)
+
+
+def get_cum_weights(size, skew):
+    """Returns cumulative Zipf weights of ranks ``0..size - 1``."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(size)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными тестовыми данными для замеров. '
+        'Число подписчиков авторов, постов авторов и комментариев постов '
+        'распределено по степенному закону. Одно и то же зерно дает одни и '
+        'те же данные. Все пользователи получают один пароль.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=USERS)
+        parser.add_argument('--groups', type=int, default=GROUPS)
+        parser.add_argument('--posts', type=int, default=POSTS)
+        parser.add_argument('--comments', type=int, default=COMMENTS)
+        parser.add_argument('--follows', type=int, default=FOLLOWS)
+        parser.add_argument(
+            '--image-ratio',
+            type=float,
+            default=IMAGE_RATIO,
+            help='Доля постов с изображением.'
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=SKEW,
+            help='Показатель степенного распределения популярности.'
+        )
+        parser.add_argument('--days', type=int, default=DAYS)
+        parser.add_argument('--password', default=PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker(LOCALE)
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        self.now = timezone.now().replace(microsecond=0)
+        started = time.perf_counter()
+        try:
+            users = self.seed_users(
+                options['users'],
+                options['password'],
+                options['seed']
+            )
+            groups = self.seed_groups(options['groups'], options['seed'])
+        except IntegrityError:
+            raise CommandError(
+                'Пользователи или сообщества с такими именами уже есть, '
+                'укажите другое --seed.'
+            )
+        self.seed_follows(users, options['follows'])
+        posts = self.seed_posts(
+            users,
+            groups,
+            options['posts'],
+            options['image_ratio'],
+            options['days'],
+            options['seed']
+        )
+        self.seed_comments(users, posts, options['comments'])
+        self.stdout.write(
+            f'Создано пользователей: {len(users)}, сообществ: {len(groups)}, '
+            f'постов: {len(posts)}, за {time.perf_counter() - started:.1f} '
+            f'с. Варианты изображений создает generate_thumbnails.'
+        )
+
+    def insert(self, model, rows):
+        """Writes rows in batches, returns primary keys given to them."""
+        watermark = get_watermark(model)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.write_batch(model, batch)
+                batch = []
+        self.write_batch(model, batch)
+        return list(
+            model.objects.filter(pk__gt=watermark).order_by('pk').values_list(
+                'pk',
+                flat=True
+            )
+        )
+
+    def write_batch(self, model, batch):
+        with transaction.atomic():
+            watermark = get_watermark(model)
+            insert_rows(model, batch)
+            catch_up(model, watermark)
+
+    def pick(self, population, count, cum_weights):
+        """Returns count items of population, the first ones are popular."""
+        return self.random.choices(
+            population,
+            cum_weights=cum_weights,
+            k=count
+        )
+
+    def rank(self, ids):
+        """Returns ids shuffled, so popularity doesn't follow the ids."""
+        ranked = list(ids)
+        self.random.shuffle(ranked)
+        return ranked
+
+    def seed_users(self, count, password, seed):
+        password = make_password(password, salt=f'yatubeseed{seed}')
+        faker = self.faker
+        return self.insert(User, (
+            {
+                'password': password,
+                'last_login': None,
+                'is_superuser': False,
+                'username': f'{faker.user_name()}_{seed}_{number}',
+                'first_name': faker.first_name(),
+                'last_name': faker.last_name(),
+                'email': faker.email(),
+                'is_staff': False,
+                'is_active': True,
+                'date_joined': self.now,
+            }
+            for number in range(count)
+        ))
+
+    def seed_groups(self, count, seed):
+        faker = self.faker
+        return self.insert(Group, (
+            {
+                'title': faker.sentence(nb_words=3).rstrip('.'),
+                'slug': f'{faker.slug()}-{seed}-{number}',
+                'description': faker.paragraph(),
+            }
+            for number in range(count)
+        ))
+
+    def seed_follows(self, users, count):
+        """Follows authors picked by popularity, skipping repeats."""
+        if len(users) < 2:
+            return
+        authors = self.rank(users)
+        cum_weights = get_cum_weights(len(authors), self.skew)
+        count = min(count, len(users) * (len(users) - 1))
+        pairs = set()
+        rows = []
+        while len(pairs) < count:
+            followers = self.random.choices(users, k=count - len(pairs))
+            picked = self.pick(authors, len(followers), cum_weights)
+            for user_id, author_id in zip(followers, picked):
+                pair = (user_id, author_id)
+                if user_id != author_id and pair not in pairs:
+                    pairs.add(pair)
+                    rows.append({
+                        'user_id': user_id,
+                        'author_id': author_id,
+                        'timeline_since': None,
+                    })
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            assign_fan_out(batch)
+            # The new authors have no posts yet, there is nothing to copy
+            # to the timelines: posts are delivered as they are written.
+            with transaction.atomic():
+                insert_rows(Follow, batch)
+
+    def make_images(self, seed):
+        """Saves a pool of images, returns their names and placeholders."""
+        images = []
+        for number in range(IMAGES):
+            name = f'posts/seed_{seed}_{number}.jpg'
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            image = Image.new('RGB', IMAGE_SIZE, color)
+            draw = ImageDraw.Draw(image)
+            for _ in range(8):
+                box = sorted(self.random.sample(range(IMAGE_SIZE[0]), 2))
+                box += sorted(self.random.sample(range(IMAGE_SIZE[1]), 2))
+                draw.ellipse(
+                    (box[0], box[2], box[1], box[3]),
+                    fill=tuple(self.random.randrange(256) for _ in range(3))
+                )
+            content = BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(content.getvalue()))
+            images.append((name, make_placeholder(content)))
+        return images
+
+    def seed_posts(self, users, groups, count, image_ratio, days, seed):
+        sentences = [self.faker.sentence() for _ in range(SENTENCES)]
+        images = self.make_images(seed) if image_ratio > 0 else []
+        authors = self.rank(users)
+        picked = self.pick(
+            authors,
+            count,
+            get_cum_weights(len(authors), self.skew)
+        )
+        span = days * 24 * 60 * 60
+        rng = self.random
+        ages = []
+
+        def make_post(author_id):
+            ages.append(rng.randrange(span))
+            pub_date = self.now - timedelta(seconds=ages[-1])
+            image, placeholder = '', ''
+            if images and rng.random() < image_ratio:
+                image, placeholder = rng.choice(images)
+            return {
+                'text': ' '.join(rng.choices(sentences, k=rng.randint(1, 6))),
+                'pub_date': pub_date,
+                'author_id': author_id,
+                'group_id': (
+                    rng.choice(groups) if groups and rng.random() < 0.5
+                    else None
+                ),
+                'image': image,
+                'image_placeholder': placeholder,
+                'image_placeholder_source': image,
+                'image_variants': {},
+                'updated': pub_date,
+                'comment_count': 0,
+            }
+
+        posts = self.insert(
+            Post,
+            (make_post(author_id) for author_id in picked)
+        )
+        return list(zip(posts, ages))
+
+    def seed_comments(self, users, posts, count):
+        """Comments posts picked by popularity after they are published."""
+        if not posts:
+            return
+        sentences = [self.faker.sentence() for _ in range(SENTENCES)]
+        ranked = self.rank(posts)
+        picked = self.pick(
+            ranked,
+            count,
+            get_cum_weights(len(ranked), self.skew)
+        )
+        rng = self.random
+        self.insert(Comment, (
+            {
+                'post_id': post_id,
+                'author_id': rng.choice(users),
+                'text': rng.choice(sentences),
+                'created': self.now - timedelta(
+                    seconds=rng.randrange(age + 1)
+                ),
+            }
+            for post_id, age in picked
+        ))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import migrations
+
+
+POSTGRES_FORWARD = (
+    'CREATE TABLE posts_post_search ('
+    'post_id integer PRIMARY KEY, '
+    'document tsvector NOT NULL'
+    ')',
+    'CREATE INDEX posts_post_search_document_idx '
+    'ON posts_post_search USING gin (document)',
+    'INSERT INTO posts_post_search (post_id, document) '
+    'SELECT id, to_tsvector(%s, text) FROM posts_post',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE posts_post_fts USING fts5 (text)',
+    'INSERT INTO posts_post_fts (rowid, text) SELECT id, text FROM posts_post',
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_FORWARD:
+            params = [settings.SEARCH_CONFIG] if '%s' in statement else None
+            schema_editor.execute(statement, params)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    table = {
+        'postgresql': 'posts_post_search',
+        'sqlite': 'posts_post_fts',
+    }.get(schema_editor.connection.vendor)
+    if table:
+        schema_editor.execute(f'DROP TABLE {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.12 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder_source',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Изображение заглушки'),
+        ),
+    ]
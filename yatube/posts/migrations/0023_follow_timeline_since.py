@@ -0,0 +1,44 @@
+# Generated by Django 3.2.12 on 2026-10-18 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def mark_partial_timelines(apps, schema_editor):
+    """Marks follows whose backfill may have left out older posts.
+
+    Posts published after the backfill were fanned out, so everything newer
+    than the ``TIMELINE_BACKFILL``-th latest post is in the timeline.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    follows = Follow.objects.filter(fan_out=True).only('author_id')
+    for follow in follows.iterator(chunk_size=BATCH_SIZE):
+        since = next(iter(
+            Post.objects.filter(author_id=follow.author_id).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pub_date', flat=True)[
+                settings.TIMELINE_BACKFILL - 1:settings.TIMELINE_BACKFILL
+            ]
+        ), None)
+        if since is not None:
+            Follow.objects.filter(pk=follow.pk).update(timeline_since=since)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_post_image_placeholder_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_since',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Более ранние посты автора читаются из таблицы постов', null=True, verbose_name='Лента заполнена с'),
+        ),
+        migrations.RunPython(mark_partial_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def drop_search_foreign_key(apps, schema_editor):
+    """Lets flush truncate posts without knowing about the search table.
+
+    Databases migrated before 0017 stopped creating the key still have it.
+    Rows of deleted posts are removed by the post signals, and the ones
+    left over by ``TRUNCATE`` are pruned after ``flush``.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE posts_post_search '
+            'DROP CONSTRAINT IF EXISTS posts_post_search_post_id_fkey'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_follow_timeline_since'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            drop_search_foreign_key,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -39,9 +39,46 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    image_placeholder = models.TextField(
+        'Заглушка изображения',
+        blank=True,
+        editable=False
+    )
+    image_placeholder_source = models.CharField(
+        'Изображение заглушки',
+        max_length=100,
+        blank=True,
+        editable=False
+    )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
         default_related_name = 'posts'
         verbose_name = 'post'
         verbose_name_plural = 'posts'
@@ -62,6 +99,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
         default_related_name = 'comments'
         verbose_name = 'comment'
         verbose_name_plural = 'comments'
@@ -80,9 +123,66 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following')
+    fan_out = models.BooleanField(
+        'Доставка в ленту',
+        default=True,
+        help_text='Посты автора копируются в ленту подписчика при публикации'
+    )
+    timeline_since = models.DateTimeField(
+        'Лента заполнена с',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Более ранние посты автора читаются из таблицы постов'
+    )
 
     class Meta:
         unique_together = ('user', 'author')
+        indexes = [
+            models.Index(
+                fields=['author', 'fan_out', 'user'],
+                name='follow_author_fan_out_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} followed {self.author.username}'
+
+
+class TimelineEntry(models.Model):
+    """Represents post delivered to the follow feed of a user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+        verbose_name = 'timeline entry'
+        verbose_name_plural = 'timeline entries'
+
+    def __str__(self):
+        return f'{self.post_id} for {self.user_id}'
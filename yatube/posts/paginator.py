@@ -0,0 +1,149 @@
+"""Posts app paginator file"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+PAGINATE_BY = settings.PAGINATE_BY
+ESTIMATED_COUNT_THRESHOLD = settings.ESTIMATED_COUNT_THRESHOLD
+CURSOR_SEPARATOR = '|'
+
+
+def encode_cursor(values):
+    """Packs ``(datetime, pk)`` key of a row into an opaque url-safe token."""
+    moment, pk = values
+    raw = f'{moment.isoformat()}{CURSOR_SEPARATOR}{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpacks token made by ``encode_cursor``, returns None if it's broken."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        moment, pk = raw.decode().split(CURSOR_SEPARATOR)
+        return datetime.fromisoformat(moment), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def normalize_cursor(token):
+    """Returns token in canonical form or None if it can't be decoded."""
+    values = decode_cursor(token)
+    return encode_cursor(values) if values else None
+
+
+class CursorPaginator(Paginator):
+    """Paginates by ``(pub_date, pk)`` keyset instead of COUNT and OFFSET.
+
+    Every page is a single range scan of ``per_page + 1`` rows whatever its
+    depth. Pages are addressed by ``?after=`` and ``?before=`` tokens taken
+    from ``next_cursor`` and ``previous_cursor``. Rows may be model
+    instances or ``values()`` dicts.
+    """
+    cursor = True
+
+    def __init__(self, object_list, per_page, fields=('pub_date', 'pk'),
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.fields = fields
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def get_key(self, obj):
+        if isinstance(obj, dict):
+            return tuple(obj[field] for field in self.fields)
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def get_rows(self, after=None, before=None):
+        """Returns rows of the page with flags telling if neighbours exist."""
+        moment_field, pk_field = self.fields
+        after, before = decode_cursor(after), decode_cursor(before)
+        limit = self.per_page + 1
+        if before:
+            moment, pk = before
+            rows = list(
+                self.object_list.filter(
+                    Q(**{f'{moment_field}__gt': moment})
+                    | Q(**{moment_field: moment, f'{pk_field}__gt': pk})
+                ).order_by(moment_field, pk_field)[:limit]
+            )
+            return rows[:self.per_page][::-1], len(rows) == limit, True
+        post_list = self.object_list
+        if after:
+            moment, pk = after
+            post_list = post_list.filter(
+                Q(**{f'{moment_field}__lt': moment})
+                | Q(**{moment_field: moment, f'{pk_field}__lt': pk})
+            )
+        rows = list(
+            post_list.order_by(f'-{moment_field}', f'-{pk_field}')[:limit]
+        )
+        return rows[:self.per_page], after is not None, len(rows) == limit
+
+    def make_page(self, rows, has_previous, has_next):
+        """Returns page of ``rows`` linked to its neighbours."""
+        if rows and has_previous:
+            self.previous_cursor = encode_cursor(self.get_key(rows[0]))
+        if rows and has_next:
+            self.next_cursor = encode_cursor(self.get_key(rows[-1]))
+        return Page(rows, 1, self)
+
+    def get_cursor_page(self, after=None, before=None):
+        """Returns page following ``after`` or preceding ``before`` token."""
+        return self.make_page(*self.get_rows(after, before))
+
+
+class EstimatedCountPaginator(Paginator):
+    """Takes the number of rows of a big table from planner statistics.
+
+    PostgreSQL has to scan the whole table to answer ``COUNT(*)``. When the
+    queryset is not filtered and the statistics say the table holds more
+    than ``ESTIMATED_COUNT_THRESHOLD`` rows, their estimate is used instead.
+    Smaller tables, filtered querysets and other databases are counted.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimate()
+        if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+    def get_estimate(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct:
+            return None
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [query.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+
+def get_page(request, post_list, **kwargs):
+    """Returns page of ``post_list`` requested by query string.
+
+    Keyset pagination is used unless an old numbered ``?page=`` link was
+    followed, then the page is built by the regular ``Paginator``.
+    """
+    if 'page' in request.GET:
+        paginator = Paginator(post_list, PAGINATE_BY)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(post_list, PAGINATE_BY, **kwargs)
+    return paginator.get_cursor_page(
+        request.GET.get('after'),
+        request.GET.get('before')
+    )
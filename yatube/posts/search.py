@@ -0,0 +1,202 @@
+"""Posts app full-text search file
+
+PostgreSQL keeps a ``tsvector`` of every post in ``posts_post_search``
+with a GIN index, SQLite keeps the texts in the FTS5 table
+``posts_post_fts``. Both are updated by the post signals one post at a
+time, and rows left over by ``flush`` are pruned after it. Other
+databases fall back to a ``LIKE`` scan.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+
+SEARCH_CONFIG = settings.SEARCH_CONFIG
+POSTGRES_TABLE = 'posts_post_search'
+SQLITE_TABLE = 'posts_post_fts'
+
+
+def index_posts(rows):
+    """Adds or replaces ``(pk, text)`` rows in the search index."""
+    rows = list(rows)
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.executemany(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) '
+                f'VALUES (%s, to_tsvector(%s, %s)) '
+                f'ON CONFLICT (post_id) '
+                f'DO UPDATE SET document = EXCLUDED.document',
+                [(pk, SEARCH_CONFIG, text) for pk, text in rows]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.executemany(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, text) VALUES (%s, %s)',
+                rows
+            )
+
+
+def unindex_post(pk):
+    """Removes post from the search index."""
+    table = {
+        'postgresql': f'{POSTGRES_TABLE} WHERE post_id = %s',
+        'sqlite': f'{SQLITE_TABLE} WHERE rowid = %s',
+    }.get(connection.vendor)
+    if table:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}', [pk])
+
+
+def prune_index():
+    """Removes rows of posts that no longer exist from the search index.
+
+    ``flush`` empties the posts table but not the index, which Django does
+    not know about. Does nothing until the index is migrated in.
+    """
+    index = {
+        'postgresql': (POSTGRES_TABLE, 'post_id'),
+        'sqlite': (SQLITE_TABLE, 'rowid'),
+    }.get(connection.vendor)
+    if index is None:
+        return
+    table, id_column = index
+    post_table = connection.ops.quote_name(Post._meta.db_table)
+    post_id = connection.ops.quote_name(Post._meta.pk.column)
+    with connection.cursor() as cursor:
+        if table in connection.introspection.table_names(cursor):
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {id_column} '
+                f'NOT IN (SELECT {post_id} FROM {post_table})'
+            )
+
+
+def fts5_query(query):
+    """Turns user input into FTS5 query matching all of its words."""
+    return ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def get_match_sql(query):
+    """Returns ``(id, rank, source, params)`` SQL of posts matching query.
+
+    ``source`` is the ``FROM`` and ``WHERE`` clauses selecting the matches,
+    ``id`` and ``rank`` are their columns, the lower rank the more relevant.
+    Returns None on databases without an index.
+    """
+    if connection.vendor == 'postgresql':
+        return (
+            'post_id',
+            '-ts_rank(document, query)',
+            f'{POSTGRES_TABLE}, plainto_tsquery(%s, %s) AS query '
+            f'WHERE document @@ query',
+            [SEARCH_CONFIG, query],
+        )
+    if connection.vendor == 'sqlite':
+        return (
+            'rowid',
+            'rank',
+            f'{SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s',
+            [fts5_query(query)],
+        )
+    return None
+
+
+def search_post_ids(query, limit=None, offset=0):
+    """Returns ids of posts matching query, the most relevant first."""
+    if not query.split():
+        return []
+    match = get_match_sql(query)
+    if match is None:
+        ids = Post.objects.filter(text__icontains=query).values_list(
+            'pk',
+            flat=True
+        )
+        if limit is None:
+            return list(ids[offset:])
+        return list(ids[offset:offset + limit])
+    id_column, rank, source, params = match
+    sql = f'SELECT {id_column} FROM {source} ORDER BY {rank}, {id_column} DESC'
+    if limit is not None:
+        sql += ' LIMIT %s OFFSET %s'
+        params = params + [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [pk for pk, in cursor.fetchall()]
+
+
+def count_posts(query):
+    """Returns the number of posts matching query."""
+    if not query.split():
+        return 0
+    match = get_match_sql(query)
+    if match is None:
+        return Post.objects.filter(text__icontains=query).count()
+    _, _, source, params = match
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {source}', params)
+        return cursor.fetchone()[0]
+
+
+class SearchResults:
+    """Ids of posts matching query, read from the index a slice at a time.
+
+    Paginator counts the matches and then reads only the ids of the
+    requested page, so every match can be reached without loading them all.
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def count(self):
+        return count_posts(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return search_post_ids(self.query, 1, key)[0]
+        start = key.start or 0
+        if key.stop is None:
+            return search_post_ids(self.query, offset=start)
+        return search_post_ids(self.query, max(key.stop - start, 0), start)
+
+
+def search_posts(queryset, query):
+    """Filters queryset of posts to the ones matching query."""
+    match = get_match_sql(query)
+    if match is None:
+        return queryset.filter(text__icontains=query)
+    id_column, _, source, params = match
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT {id_column} FROM {source}', params)
+    )
+
+
+def get_rank(query):
+    """Returns expression of the rank of a post for query, lower is better.
+
+    Returns None on databases without an index.
+    """
+    match = get_match_sql(query)
+    if match is None:
+        return None
+    id_column, rank, source, params = match
+    post_id = '{}.{}'.format(
+        connection.ops.quote_name(Post._meta.db_table),
+        connection.ops.quote_name(Post._meta.pk.column)
+    )
+    return RawSQL(
+        f'SELECT {rank} FROM {source} AND {id_column} = {post_id}',
+        params,
+        output_field=FloatField()
+    )
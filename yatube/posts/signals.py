@@ -0,0 +1,190 @@
+"""Posts app signals file"""
+import threading
+
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from yatube.metrics import COMMENTS_CREATED, POSTS_CREATED
+
+from .cache import bump_content_version, bump_feed_version
+from .conditional import get_post_scopes, get_user_scope
+from .models import Comment, Follow, Post
+from .search import index_posts, prune_index, unindex_post
+from .tasks import schedule_post_images
+from .thumbnails import needs_images
+from .timeline import (backfill_timeline, fan_out_post, prune_timeline,
+                       should_fan_out)
+
+
+local = threading.local()
+
+
+def is_deleting(post_id):
+    """Tells if post is being deleted along with its comments."""
+    return post_id in getattr(local, 'deleting_posts', ())
+
+
+@receiver(pre_delete, sender=Post)
+def start_post_delete(sender, instance, **kwargs):
+    """Marks post whose comments are about to be deleted with it."""
+    if not hasattr(local, 'deleting_posts'):
+        local.deleting_posts = set()
+    local.deleting_posts.add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def finish_post_delete(sender, instance, **kwargs):
+    local.deleting_posts.discard(instance.pk)
+
+
+@receiver(request_finished)
+def forget_failed_deletes(sender, **kwargs):
+    """Drops marks of posts whose deletion failed half way."""
+    local.deleting_posts = set()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feed(sender, **kwargs):
+    """Drops cached home feed pages when a post is changed."""
+    bump_feed_version()
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Keeps the group post was loaded with, its page shows the post too."""
+    # Reading a deferred field would query the post.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    """Changes the ETag of the pages showing the post."""
+    bump_content_version(*get_post_scopes(
+        instance.pk,
+        instance.author_id,
+        instance.group_id,
+        instance._loaded_group_id
+    ))
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    """Changes the ETag of the pages showing the comment or its counter."""
+    # The pages of a deleted post are changed by its own receiver.
+    if is_deleting(instance.post_id):
+        return
+    post = instance.post
+    bump_content_version(
+        *get_post_scopes(post.pk, post.author_id, post.group_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    """Changes the ETag of the pages of the follower and the author."""
+    bump_content_version(
+        get_user_scope(instance.user_id),
+        get_user_scope(instance.author_id)
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    """Keeps the search index of the post up to date."""
+    index_posts([(instance.pk, instance.text)])
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_from_index(sender, instance, **kwargs):
+    """Removes deleted post from the search index."""
+    unindex_post(instance.pk)
+
+
+@receiver(post_migrate)
+def prune_search_index(sender, using, **kwargs):
+    """Drops index rows of the posts emptied by ``flush``."""
+    if sender.name == 'posts' and using == connection.alias:
+        prune_index()
+
+
+@receiver(post_save, sender=Post)
+def make_images(sender, instance, **kwargs):
+    """Generates variants of post image outside of the request."""
+    if needs_images(instance):
+        schedule_post_images(instance)
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, **kwargs):
+    """Copies new post to the timelines of author's followers."""
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(pre_save, sender=Follow)
+def choose_delivery(sender, instance, **kwargs):
+    """Decides if new follower is served by fan-out or merge on read."""
+    if instance._state.adding:
+        instance.fan_out = should_fan_out(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    """Copies followed author's posts to the follower's timeline."""
+    if created and instance.fan_out:
+        backfill_timeline(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    """Removes unfollowed author's posts from the follower's timeline."""
+    prune_timeline(instance)
+
+
+@receiver(post_save, sender=Comment)
+def increase_comment_count(sender, instance, created, raw, **kwargs):
+    """Counts new comment in the post's comment counter.
+
+    Loaded fixtures already carry the counters of their posts.
+    """
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+            updated=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_comment_count(sender, instance, **kwargs):
+    """Discounts deleted comment from the post's comment counter.
+
+    Comments deleted along with their post aren't discounted, the post is
+    gone right after them.
+    """
+    if is_deleting(instance.post_id):
+        return
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        updated=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def count_created(sender, created, raw, **kwargs):
+    """Counts new posts and comments in the application metrics.
+
+    Rows loaded in bulk don't send signals and aren't counted.
+    """
+    if created and not raw:
+        (POSTS_CREATED if sender is Post else COMMENTS_CREATED).inc()
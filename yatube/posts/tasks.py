@@ -0,0 +1,58 @@
+"""Posts app background tasks file
+
+Tasks run in a small thread pool of the web process once the transaction
+that scheduled them is committed, so the request doesn't wait for them.
+The pool is started by the WSGI application only: management commands and
+tests don't spawn threads. Tasks they skip or left unfinished when the
+process exits are picked up by the ``generate_thumbnails`` command.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .thumbnails import make_post_images
+
+
+logger = logging.getLogger(__name__)
+executor = None
+
+
+def start_workers():
+    """Starts the pool running background tasks of this process."""
+    global executor
+    if executor is None and settings.THUMBNAIL_WORKERS:
+        # Threads are started by the first task, so the pool survives the
+        # fork of preloading servers.
+        executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='posts-tasks'
+        )
+
+
+def run_in_background(function, *args):
+    """Runs task in a pool thread, logging its errors."""
+    try:
+        function(*args)
+    except Exception:
+        logger.exception(
+            'Background task %s%r failed', function.__name__, args
+        )
+    finally:
+        # Every pool thread has its own connections, they must not leak.
+        connections.close_all()
+
+
+def schedule(function, *args):
+    """Runs ``function(*args)`` in background after the current commit."""
+    if executor is None:
+        return
+    transaction.on_commit(
+        lambda: executor.submit(run_in_background, function, *args)
+    )
+
+
+def schedule_post_images(post):
+    """Makes variants of post image in background."""
+    schedule(make_post_images, post.pk, post.image.name)
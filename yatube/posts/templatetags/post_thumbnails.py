@@ -0,0 +1,79 @@
+from django import template
+from sorl.thumbnail import default
+
+from posts.thumbnails import (get_current_placeholder, get_current_variants,
+                              get_post_thumbnail, preload_post_thumbnails)
+
+register = template.Library()
+
+FALLBACK_WIDTH = 960
+# Cards at the top of a page, likely seen without scrolling, load their
+# images at once.
+EAGER_CARDS = 2
+# Width of the card in the bootstrap container at every breakpoint.
+CARD_SIZES = (
+    '(min-width: 1200px) 1110px, (min-width: 992px) 930px, '
+    '(min-width: 768px) 690px, (min-width: 576px) 510px, 100vw'
+)
+
+
+@register.simple_tag
+def preload_post_images(posts):
+    """Looks up the images of all ``posts`` at once before they render."""
+    preload_post_thumbnails(posts)
+    return ''
+
+
+@register.filter
+def loads_eagerly(position):
+    """Tells if the card at 1-based position of a page loads image at once."""
+    return bool(position) and position <= EAGER_CARDS
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, eager=False):
+    """Renders post image as a picture of its variants.
+
+    Never generates images. The inline placeholder shows through until the
+    picture is loaded. Until the variants are ready the single old thumbnail
+    is shown if it exists, otherwise the placeholder alone. Images of cards
+    below the first ones are loaded lazily.
+    """
+    if not post.image:
+        return {}
+    variants = get_current_variants(post)
+    placeholder = get_current_placeholder(post)
+    if variants is None:
+        return {
+            'pending': True,
+            'thumbnail': get_post_thumbnail(post.image),
+            'placeholder': placeholder,
+            'lazy': not eager,
+        }
+    sources = {}
+    for variant in variants:
+        sources.setdefault(variant['format'], []).append(
+            dict(variant, url=default.storage.url(variant['name']))
+        )
+    jpeg = sources.get('jpeg') or next(iter(sources.values()))
+    fallback = max(
+        (variant for variant in jpeg if variant['width'] <= FALLBACK_WIDTH),
+        key=lambda variant: variant['width'],
+        default=jpeg[0]
+    )
+    return {
+        'sources': [
+            {
+                'type': f'image/{image_format}',
+                'srcset': ', '.join(
+                    f"{variant['url']} {variant['width']}w"
+                    for variant in format_variants
+                ),
+            }
+            for image_format, format_variants in sources.items()
+        ],
+        'sizes': CARD_SIZES,
+        'fallback': fallback,
+        'placeholder': placeholder,
+        'lazy': not eager,
+    }
@@ -0,0 +1,85 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import EstimatedCountPaginator
+from posts.tests.utils import QueryBudgetMixin
+
+
+ADMIN = 'admin'
+GROUP_SLUG = 'test_slug'
+POST_TEXT = 'Тестовый текст поста'
+COMMENT_TEXT = 'Тестовый текст комментария'
+
+
+class AdminQueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username=ADMIN,
+            password=ADMIN
+        )
+        cls.group = Group.objects.create(
+            title=GROUP_SLUG,
+            slug=GROUP_SLUG,
+            description=GROUP_SLUG
+        )
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(AdminQueryBudgetTest.admin)
+
+    def seed(self, size):
+        for _ in range(size - Post.objects.count()):
+            author = User.objects.create_user(
+                username=f'author_{User.objects.count()}'
+            )
+            post = Post.objects.create(
+                text=POST_TEXT,
+                author=author,
+                group=AdminQueryBudgetTest.group
+            )
+            Comment.objects.create(text=COMMENT_TEXT, author=author, post=post)
+            Follow.objects.create(
+                user=AdminQueryBudgetTest.admin,
+                author=author
+            )
+
+    def test_changelists_query_budget(self):
+        """Число запросов списков админки не зависит от объема данных."""
+        budgets = (
+            (self.admin_client, reverse('admin:posts_post_changelist'), 5),
+            (self.admin_client, reverse('admin:posts_comment_changelist'), 5),
+            (self.admin_client, reverse('admin:posts_follow_changelist'), 5),
+        )
+        self.assertQueryBudgets(budgets)
+
+    def test_change_forms_query_budget(self):
+        """Формы изменения не загружают списки пользователей и постов."""
+        self.seed(self.data_sizes[0])
+        post = Post.objects.get()
+        comment = Comment.objects.get()
+        budgets = (
+            (
+                self.admin_client,
+                reverse('admin:posts_post_change', args=(post.pk,)),
+                7
+            ),
+            (
+                self.admin_client,
+                reverse('admin:posts_comment_change', args=(comment.pk,)),
+                7
+            ),
+        )
+        for client, url, _ in budgets:
+            # Content types are cached in memory after the first request.
+            client.get(url)
+        self.assertQueryBudgets(budgets)
+
+    def test_paginator_counts_small_tables(self):
+        """Небольшие таблицы считаются точно."""
+        self.seed(self.data_sizes[0])
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, Post.objects.count())
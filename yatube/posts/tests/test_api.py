@@ -0,0 +1,156 @@
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+USERNAME = 'test'
+READER = 'reader'
+GROUP_SLUG = 'test_slug'
+POST_TEXT = 'Тестовый текст поста'
+COMMENT_TEXT = 'Тестовый текст комментария'
+POSTS_COUNT = 11
+API_INDEX_URL = reverse('api_index')
+API_GROUP_URL = reverse('api_group_posts', args=(GROUP_SLUG,))
+API_PROFILE_URL = reverse('api_profile', args=(USERNAME,))
+API_FOLLOW_URL = reverse('api_follow_index')
+
+
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.reader = User.objects.create_user(username=READER)
+        cls.group = Group.objects.create(
+            title=GROUP_SLUG,
+            slug=GROUP_SLUG,
+            description=GROUP_SLUG
+        )
+        for _ in range(POSTS_COUNT):
+            cls.post = Post.objects.create(
+                text=POST_TEXT,
+                author=cls.user,
+                group=cls.group
+            )
+        Comment.objects.create(
+            text=COMMENT_TEXT,
+            author=cls.reader,
+            post=cls.post
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.API_POST_URL = reverse('api_post', args=(USERNAME, cls.post.pk))
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTest.reader)
+        cache.clear()
+
+    def get_json(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(response.content)
+
+    def test_feeds_walk_all_posts_by_cursor(self):
+        """Ленты API проходят все посты по курсору."""
+        all_ids = list(Post.objects.order_by('-pub_date', '-pk').values_list(
+            'pk', flat=True
+        ))
+        for client, url in (
+            (self.guest_client, API_INDEX_URL),
+            (self.guest_client, API_GROUP_URL),
+            (self.guest_client, API_PROFILE_URL),
+            (self.reader_client, API_FOLLOW_URL),
+        ):
+            with self.subTest(url=url):
+                first_page = self.get_json(client, url)
+                self.assertIsNone(first_page['previous'])
+                second_page = self.get_json(
+                    client,
+                    f"{url}?after={first_page['next']}"
+                )
+                self.assertIsNone(second_page['next'])
+                self.assertEqual(
+                    [
+                        post['id'] for post in
+                        first_page['results'] + second_page['results']
+                    ],
+                    all_ids
+                )
+
+    def test_feed_posts_have_expected_fields(self):
+        """Посты и владельцы лент API отдаются с нужными полями."""
+        data = self.get_json(self.guest_client, API_GROUP_URL)
+        post = data['results'][0]
+        self.assertEqual(post['id'], ApiTest.post.pk)
+        self.assertEqual(post['text'], POST_TEXT)
+        self.assertEqual(post['author'], USERNAME)
+        self.assertEqual(post['group'], GROUP_SLUG)
+        self.assertEqual(post['comment_count'], 1)
+        self.assertIsNone(post['image'])
+        self.assertEqual(data['group']['slug'], GROUP_SLUG)
+        data = self.get_json(self.guest_client, API_PROFILE_URL)
+        self.assertEqual(data['author']['username'], USERNAME)
+
+    def test_post_shows_comments(self):
+        """Пост API отдается вместе с комментариями."""
+        data = self.get_json(self.guest_client, ApiTest.API_POST_URL)
+        self.assertEqual(data['post']['id'], ApiTest.post.pk)
+        self.assertEqual(
+            [comment['author'] for comment in data['comments']],
+            [READER]
+        )
+        self.assertIsNone(data['next'])
+
+    def test_api_skips_model_instances(self):
+        """API не создает экземпляры постов."""
+        with mock.patch.object(Post, 'from_db') as from_db:
+            for url in (API_INDEX_URL, ApiTest.API_POST_URL):
+                self.get_json(self.guest_client, url)
+        from_db.assert_not_called()
+
+    def test_missing_objects_not_found(self):
+        """Несуществующие сообщество, автор и пост не найдены."""
+        for url in (
+            reverse('api_group_posts', args=('missing',)),
+            reverse('api_profile', args=('missing',)),
+            reverse('api_post', args=(READER, ApiTest.post.pk)),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_feed_forbidden_to_anonymous(self):
+        """Анонимный клиент получает 403 в JSON, а не страницу входа."""
+        response = self.guest_client.get(API_FOLLOW_URL)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', json.loads(response.content))
+
+    def test_unchanged_pages_respond_not_modified(self):
+        """Неизменившиеся ответы API отдают 304, измененные - новые данные."""
+        response = self.guest_client.get(ApiTest.API_POST_URL)
+        etag = response['ETag']
+        response = self.guest_client.get(
+            ApiTest.API_POST_URL,
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(
+            text=COMMENT_TEXT,
+            author=ApiTest.user,
+            post=ApiTest.post
+        )
+        response = self.guest_client.get(
+            ApiTest.API_POST_URL,
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -1,9 +1,10 @@
-import time
-
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from posts.cache import feed_key, get_feed_version, get_or_compute
 from posts.models import Post, User
 
 
@@ -11,6 +12,8 @@ HOMEPAGE_URL = reverse('index')
 USERNAME = 'test'
 FIRST_POST_TEXT = 'Тестовый текст первого поста'
 CACHE_POST_TEXT = 'Тестовый текст поста'
+STALE_POST_TEXT = 'Текст, который не должен попасть в карточку'
+EDIT_BUTTON = 'Редактировать'
 
 
 class CacheTest(TestCase):
@@ -26,26 +29,104 @@ class CacheTest(TestCase):
 
     def setUp(self):
         self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CacheTest.user)
+        cache.clear()
+
+    def test_cache_stores_only_post_ids(self):
+        """В кэше хранятся только id постов страницы."""
+        self.client.get(HOMEPAGE_URL)
+        (cached_ids, _, _), version, _, _ = cache.get(
+            feed_key('cursor', '', '')
+        )
+        self.assertEqual(version, get_feed_version())
+        self.assertEqual(cached_ids, [CacheTest.post.pk])
 
-    def test_cache(self):
-        """Кэширование работает правильно."""
+    def test_cache_invalidated_on_post_create(self):
+        """Новый пост сразу появляется на главной странице."""
         response = self.client.get(HOMEPAGE_URL)
         self.assertEqual(len(response.context.get('page').object_list), 1)
-        Post.objects.create(
+        new_post = Post.objects.create(
             text=CACHE_POST_TEXT,
             author=CacheTest.user,
         )
         response = self.client.get(HOMEPAGE_URL)
-        self.assertEqual(len(response.context.get('page').object_list), 1)
-        time.sleep(20)
-        response = self.client.get(HOMEPAGE_URL)
         self.assertEqual(len(response.context.get('page').object_list), 2)
-        Post.objects.create(
+        self.assertEqual(response.context.get('page').object_list[0], new_post)
+
+    def test_cache_invalidated_on_post_delete(self):
+        """Удаленный пост сразу пропадает с главной страницы."""
+        post = Post.objects.create(
             text=CACHE_POST_TEXT,
             author=CacheTest.user,
         )
         response = self.client.get(HOMEPAGE_URL)
         self.assertEqual(len(response.context.get('page').object_list), 2)
-        cache.clear()
+        post.delete()
+        response = self.client.get(HOMEPAGE_URL)
+        self.assertEqual(len(response.context.get('page').object_list), 1)
+
+    def test_cached_page_skips_count_query(self):
+        """Повторный запрос страницы не пересчитывает ленту."""
+        self.client.get(HOMEPAGE_URL)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(HOMEPAGE_URL)
+        feed_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT' in query['sql'] or 'LIMIT 10' in query['sql']
+        ]
+        self.assertEqual(feed_queries, [])
+
+    def test_post_card_cached_until_post_changes(self):
+        """Карточка поста берется из кэша, пока пост не изменится."""
+        self.client.get(HOMEPAGE_URL)
+        Post.objects.filter(pk=CacheTest.post.pk).update(text=STALE_POST_TEXT)
         response = self.client.get(HOMEPAGE_URL)
-        self.assertEqual(len(response.context.get('page').object_list), 3)
+        self.assertContains(response, FIRST_POST_TEXT)
+        post = Post.objects.get(pk=CacheTest.post.pk)
+        post.text = CACHE_POST_TEXT
+        post.save()
+        response = self.client.get(HOMEPAGE_URL)
+        self.assertContains(response, CACHE_POST_TEXT)
+        self.assertNotContains(response, FIRST_POST_TEXT)
+
+    def test_post_card_edit_button_rendered_per_viewer(self):
+        """Кнопка редактирования не попадает в кэш карточки."""
+        response = self.authorized_client.get(HOMEPAGE_URL)
+        self.assertContains(response, EDIT_BUTTON)
+        response = self.client.get(HOMEPAGE_URL)
+        self.assertNotContains(response, EDIT_BUTTON)
+
+
+class StampedeProtectionTest(TestCase):
+    KEY = 'stampede_test'
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_computed_once(self):
+        """Значение вычисляется один раз и берется из кэша."""
+        self.assertEqual(get_or_compute(self.KEY, self.compute, 1), 1)
+        self.assertEqual(get_or_compute(self.KEY, self.compute, 1), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_outdated_value_recomputed_by_lock_holder(self):
+        """Устаревшее значение пересчитывает только владелец блокировки."""
+        get_or_compute(self.KEY, self.compute, 1)
+        cache.add(f'{self.KEY}:lock', True)
+        self.assertEqual(get_or_compute(self.KEY, self.compute, 2), 1)
+        self.assertEqual(self.calls, 1)
+        cache.delete(f'{self.KEY}:lock')
+        self.assertEqual(get_or_compute(self.KEY, self.compute, 2), 2)
+        self.assertEqual(get_or_compute(self.KEY, self.compute, 2), 2)
+        self.assertEqual(self.calls, 2)
+
+    def test_expired_value_refreshed(self):
+        """Истекшее значение пересчитывается."""
+        get_or_compute(self.KEY, self.compute, timeout=0)
+        self.assertEqual(get_or_compute(self.KEY, self.compute), 2)
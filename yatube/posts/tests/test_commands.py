@@ -0,0 +1,337 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts.cache import get_content_version
+from posts.management.commands import explain_feeds
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.search import search_post_ids
+
+
+USER = 'test_user'
+AUTHOR = 'test_author'
+GROUP_TITLE = 'test_group'
+GROUP_SLUG = 'test_slug'
+GROUP_DESCRIPTION = 'test_description'
+POST_TEXT = 'Тестовый текст поста'
+COMMENT_TEXT = 'Тестовый текст комментария'
+
+
+class CommandsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USER)
+        cls.author = User.objects.create_user(username=AUTHOR)
+
+        cls.post = Post.objects.create(
+            text=POST_TEXT,
+            author=cls.user
+        )
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION
+        )
+        cls.comment = Comment.objects.create(
+            text=COMMENT_TEXT,
+            author=cls.user,
+            post=cls.post,
+        )
+        cls.follow = Follow.objects.create(
+            user=cls.user,
+            author=cls.author
+        )
+
+    def test_recount_comments_fixes_counters(self):
+        """Команда recount_comments исправляет расхождения счетчиков."""
+        post = CommandsTest.post
+        Post.objects.filter(pk=post.pk).update(comment_count=5)
+        version = get_content_version()
+        updated = post.updated
+        call_command('recount_comments', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, post.comments.count())
+        self.assertGreater(post.updated, updated)
+        self.assertNotEqual(get_content_version(), version)
+
+    def test_explain_feeds_rolls_back_seeded_data(self):
+        """Команда explain_feeds не оставляет тестовых данных."""
+        posts_count = Post.objects.count()
+        output = StringIO()
+        call_command(
+            'explain_feeds',
+            posts=50,
+            authors=5,
+            repeat=1,
+            compare=True,
+            stdout=output
+        )
+        self.assertIn('profile', output.getvalue())
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    def test_explain_feeds_seeds_timelines_and_comments(self):
+        """Команда explain_feeds заполняет ленту и комментирует все посты."""
+        with transaction.atomic():
+            reader, _, post = explain_feeds.Command().seed(posts=50, authors=5)
+            self.assertEqual(
+                TimelineEntry.objects.filter(user=reader).count(),
+                Post.objects.filter(author__following__user=reader).count()
+            )
+            self.assertEqual(
+                post.comments.count(),
+                explain_feeds.COMMENTS_PER_POST
+            )
+            transaction.set_rollback(True)
+
+    def export(self, path, **options):
+        call_command(
+            'export_ndjson',
+            output=path,
+            chunk_size=1,
+            stderr=StringIO(),
+            **options
+        )
+        with gzip.open(path, 'rt') as export:
+            return [json.loads(line) for line in export]
+
+    def test_export_ndjson_streams_all_rows(self):
+        """Команда export_ndjson выгружает все строки и продолжает выгрузку."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.jsonl.gz')
+            rows = self.export(path)
+            posts = [row for row in rows if row['model'] == 'posts.post']
+            self.assertEqual(len(posts), Post.objects.count())
+            self.assertEqual(posts[0]['fields']['text'], POST_TEXT)
+            self.assertEqual(posts[0]['fields']['author'], self.user.pk)
+            self.assertEqual(
+                len(rows),
+                User.objects.count() + Group.objects.count()
+                + Post.objects.count() + Follow.objects.count()
+                + Comment.objects.count()
+            )
+            resumed = self.export(path, after_pk='posts.follow:0')
+        self.assertEqual(resumed[:len(rows)], rows)
+        self.assertEqual(
+            resumed[len(rows):],
+            [
+                row for row in rows
+                if row['model'] in ('posts.follow', 'posts.comment')
+            ]
+        )
+
+    def test_export_ndjson_since_skips_unchanged_rows(self):
+        """Команда export_ndjson с --since выгружает только изменения."""
+        since = timezone.now()
+        Post.objects.filter(pk=self.post.pk).update(updated=timezone.now())
+        with tempfile.TemporaryDirectory() as directory:
+            rows = self.export(
+                os.path.join(directory, 'export.jsonl.gz'),
+                since=since.isoformat()
+            )
+        self.assertEqual(
+            [row['pk'] for row in rows if row['model'] == 'posts.post'],
+            [self.post.pk]
+        )
+        self.assertNotIn('posts.comment', [row['model'] for row in rows])
+
+
+class ImportDataTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, model, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(content)
+        errors = StringIO()
+        call_command(
+            'import_data',
+            model,
+            path,
+            batch_size=2,
+            stdout=StringIO(),
+            stderr=errors
+        )
+        return errors.getvalue()
+
+    def test_import_data_does_signals_work(self):
+        """Команда import_data загружает данные, ленты, поиск и счетчики."""
+        self.load('users', 'users.csv', f'username\n{USER}\n{AUTHOR}\n')
+        self.load('groups', 'groups.csv', (
+            'title,slug,description\n'
+            f'{GROUP_TITLE},{GROUP_SLUG},{GROUP_DESCRIPTION}\n'
+        ))
+        self.load(
+            'follows',
+            'follows.ndjson',
+            json.dumps({'user': USER, 'author': AUTHOR})
+        )
+        pub_date = '2020-01-01T00:00:00+00:00'
+        errors = self.load('posts', 'posts.ndjson', '\n'.join(
+            json.dumps(row) for row in (
+                {'text': POST_TEXT, 'author': AUTHOR, 'group': GROUP_SLUG,
+                 'pub_date': pub_date},
+                {'text': '', 'author': AUTHOR},
+                {'text': POST_TEXT, 'author': 'missing'},
+            )
+        ))
+        self.assertEqual(errors.count('пропущена'), 2)
+        post = Post.objects.get()
+        self.assertEqual(post.group.slug, GROUP_SLUG)
+        self.assertEqual(post.pub_date.isoformat(), pub_date)
+        self.assertEqual(search_post_ids(POST_TEXT), [post.pk])
+        self.assertTrue(
+            TimelineEntry.objects.filter(user__username=USER, post=post)
+        )
+        self.load('comments', 'comments.csv', (
+            'post,author,text\n'
+            f'{post.pk},{USER},{COMMENT_TEXT}\n'
+            f'{post.pk},{USER},{COMMENT_TEXT}\n'
+            f'{post.pk + 1},{USER},{COMMENT_TEXT}\n'
+        ))
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(post.comments.count(), 2)
+
+    def test_import_data_skips_malformed_rows(self):
+        """Команда import_data пропускает битые строки и не падает."""
+        self.load('users', 'users.csv', f'username\n{AUTHOR}\n')
+        errors = self.load('posts', 'posts.ndjson', '\n'.join((
+            json.dumps({'text': None, 'author': AUTHOR}),
+            '{"text": ',
+            json.dumps([POST_TEXT, AUTHOR]),
+            json.dumps({'text': POST_TEXT, 'author': [AUTHOR]}),
+            json.dumps({'text': POST_TEXT, 'author': AUTHOR}),
+            json.dumps(
+                {'text': POST_TEXT, 'author': AUTHOR, 'group': [GROUP_SLUG]}
+            ),
+        )))
+        for number in (1, 2, 3, 4, 6):
+            self.assertIn(f'Строка {number} пропущена', errors)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            [POST_TEXT]
+        )
+        errors = self.load('posts', 'posts.csv', f'author\n{AUTHOR}\n')
+        self.assertIn('Строка 1 пропущена', errors)
+        self.assertEqual(Post.objects.count(), 1)
+
+
+class SeedTest(TestCase):
+
+    def seed(self, **options):
+        """Returns what the seed command made, rolling it back."""
+        with transaction.atomic():
+            call_command(
+                'seed',
+                users=20,
+                groups=2,
+                posts=50,
+                comments=100,
+                follows=60,
+                batch_size=7,
+                stdout=StringIO(),
+                **options
+            )
+            made = (
+                list(User.objects.values_list('username', flat=True)),
+                list(Post.objects.values_list('text', 'author__username')),
+                list(Follow.objects.values_list(
+                    'user__username',
+                    'author__username'
+                )),
+                Comment.objects.count(),
+                TimelineEntry.objects.count(),
+            )
+            transaction.set_rollback(True)
+        return made
+
+    def test_seed_is_deterministic(self):
+        """Команда seed с одним зерном создает одни и те же данные."""
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                made = self.seed(seed=1)
+                self.assertEqual(self.seed(seed=1), made)
+                self.assertNotEqual(self.seed(seed=2), made)
+        users, posts, follows, comments, timeline = made
+        self.assertEqual(
+            (len(users), len(posts), len(follows), comments),
+            (20, 50, 60, 100)
+        )
+        self.assertGreater(timeline, 0)
+
+
+class BenchmarkViewsTest(TransactionTestCase):
+    """Worker threads use their own connections, the data is committed."""
+
+    def setUp(self):
+        user = User.objects.create_user(username=USER)
+        author = User.objects.create_user(username=AUTHOR)
+        group = Group.objects.create(title=GROUP_TITLE, slug=GROUP_SLUG)
+        post = Post.objects.create(text=POST_TEXT, author=author, group=group)
+        Comment.objects.create(text=COMMENT_TEXT, author=user, post=post)
+        Follow.objects.create(user=user, author=author)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'baseline.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_views',
+            requests=4,
+            concurrency=2,
+            warmup=1,
+            stdout=StringIO(),
+            stderr=StringIO(),
+            **options
+        )
+
+    def test_benchmark_views_compares_with_baseline(self):
+        """Команда benchmark_views сохраняет результаты и ловит замедление."""
+        self.benchmark(save_baseline=self.path)
+        with open(self.path) as baseline:
+            baseline = json.load(baseline)
+        results = baseline['results']
+        self.assertIn('post:user', results)
+        self.assertIn('about:tech:guest', results)
+        self.assertNotIn('profile_follow:user', results)
+        for case, result in results.items():
+            with self.subTest(case=case):
+                self.assertLess(max(result['statuses']), 500)
+                self.assertLessEqual(result['p50'], result['p99'])
+        for result in results.values():
+            result['p95'] = 0
+        with open(self.path, 'w') as changed:
+            json.dump(baseline, changed)
+        with self.assertRaisesMessage(CommandError, 'p95'):
+            self.benchmark(baseline=self.path, routes=['about:tech'])
+
+    def test_benchmark_views_compares_median_queries(self):
+        """Команда benchmark_views сравнивает медиану запросов с допуском."""
+        self.benchmark(save_baseline=self.path, routes=['index'])
+        with open(self.path) as baseline:
+            baseline = json.load(baseline)
+        for result in baseline['results'].values():
+            self.assertIsInstance(result['queries'], int)
+            result['p95'] = float('inf')
+            result['queries'] -= 1
+        with open(self.path, 'w') as changed:
+            json.dump(baseline, changed)
+        with self.assertRaisesMessage(CommandError, 'запросов'):
+            self.benchmark(baseline=self.path, routes=['index'])
+        self.benchmark(baseline=self.path, routes=['index'], query_tolerance=1)
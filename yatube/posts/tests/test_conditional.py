@@ -0,0 +1,151 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+USERNAME = 'test'
+GROUP_SLUG = 'test_slug'
+POST_TEXT = 'Тестовый текст поста'
+COMMENT_TEXT = 'Тестовый текст комментария'
+HOMEPAGE_URL = reverse('index')
+GROUP_URL = reverse('group_posts', args=(GROUP_SLUG,))
+PROFILE_URL = reverse('profile', args=(USERNAME,))
+OTHER_USERNAME = 'other'
+OTHER_GROUP_SLUG = 'other_slug'
+OTHER_GROUP_URL = reverse('group_posts', args=(OTHER_GROUP_SLUG,))
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_SLUG,
+            slug=GROUP_SLUG,
+            description=GROUP_SLUG
+        )
+        cls.post = Post.objects.create(
+            text=POST_TEXT,
+            author=cls.user,
+            group=cls.group
+        )
+        cls.POST_URL = reverse('post', args=(USERNAME, cls.post.pk))
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTest.user)
+        cache.clear()
+
+    def test_unchanged_pages_respond_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 без рендеринга."""
+        for url in (
+            HOMEPAGE_URL,
+            GROUP_URL,
+            PROFILE_URL,
+            ConditionalGetTest.POST_URL
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertFalse(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url,
+                    HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(
+                    response.status_code,
+                    HTTPStatus.NOT_MODIFIED
+                )
+                self.assertIsNone(response.context)
+
+    def test_changed_post_page_is_rendered_again(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = ConditionalGetTest.POST_URL
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            text=COMMENT_TEXT,
+            author=ConditionalGetTest.user,
+            post=ConditionalGetTest.post
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, COMMENT_TEXT)
+
+    def test_etag_depends_on_viewer(self):
+        """Разные пользователи получают разные ETag."""
+        etag = self.guest_client.get(HOMEPAGE_URL)['ETag']
+        response = self.authorized_client.get(
+            HOMEPAGE_URL,
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_deleted_post_changes_etag(self):
+        """Удаление поста меняет ETag страниц, где он был."""
+        post = Post.objects.create(
+            text=COMMENT_TEXT,
+            author=ConditionalGetTest.user,
+            group=ConditionalGetTest.group
+        )
+        for url in (HOMEPAGE_URL, GROUP_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                post.delete()
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotContains(response, COMMENT_TEXT)
+                post.save()
+
+    def test_not_modified_skips_page_queries(self):
+        """Ответ 304 не запрашивает посты и счетчики автора."""
+        url = PROFILE_URL
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_unrelated_changes_keep_etag(self):
+        """Изменения чужих постов меняют ETag только их страниц."""
+        other = User.objects.create_user(username=OTHER_USERNAME)
+        expected = {
+            HOMEPAGE_URL: HTTPStatus.OK,
+            GROUP_URL: HTTPStatus.NOT_MODIFIED,
+            PROFILE_URL: HTTPStatus.NOT_MODIFIED,
+            ConditionalGetTest.POST_URL: HTTPStatus.NOT_MODIFIED,
+        }
+        etags = {url: self.guest_client.get(url)['ETag'] for url in expected}
+        post = Post.objects.create(text=POST_TEXT, author=other)
+        Comment.objects.create(text=COMMENT_TEXT, author=other, post=post)
+        for url, status in expected.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url,
+                    HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, status)
+
+    def test_moved_post_changes_etag_of_old_group(self):
+        """Перенос поста в другую группу меняет ETag прежней группы."""
+        other_group = Group.objects.create(
+            title=OTHER_GROUP_SLUG,
+            slug=OTHER_GROUP_SLUG,
+            description=OTHER_GROUP_SLUG
+        )
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in (GROUP_URL, OTHER_GROUP_URL)
+        }
+        post = Post.objects.get(pk=ConditionalGetTest.post.pk)
+        post.group = other_group
+        post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
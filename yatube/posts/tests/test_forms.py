@@ -1,15 +1,21 @@
+import base64
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from http import HTTPStatus
 
-from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
-from django.urls import reverse
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, get_resolver, reverse
+from PIL import Image
 
 from posts.models import Post, User
 from posts.forms import PostForm
+from posts.images import (BROKEN_IMAGE, IMAGE_MAX_SIZE, PLACEHOLDER_SIZE,
+                          ingest_image, make_placeholder)
+from users.forms import RESERVED_USERNAMES, CreationForm
 
 
 HOMEPAGE_URL = reverse('index')
@@ -18,7 +24,9 @@ USERNAME = 'test'
 TEST_POST_TEXT = 'Тестовый текст поста'
 FORM_POST_TEXT = 'Тестовый текст поста через форму'
 EDIT_POST_TEXT = 'Редактированный текст поста через форму'
+COMMENT_COUNT = 3
 EMPTY_TEXT = ''
+PASSWORD = 'Zx8-pass-Qw3'
 ERROR_MSG = 'Обязательное поле.'
 SMALL_GIF = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
@@ -33,13 +41,23 @@ IMAGE_URL = f'posts/{IMAGE_NAME}'
 EDIT_IMAGE_NAME = 'edit_image.gif'
 EDIT_IMAGE_URL = f'posts/{EDIT_IMAGE_NAME}'
 CONTENT_TYPE = 'image/gif'
+JPEG_NAME = 'photo.jpg'
+JPEG_CONTENT_TYPE = 'image/jpeg'
+EXIF_ARTIST_TAG = 0x013B
+EXIF_ARTIST = 'test'
+EXIF_ORIENTATION_TAG = 0x0112
+PLACEHOLDER_PREFIX = 'data:image/jpeg;base64,'
+XPM_NAME = 'image.xpm'
+PNG_NAME = 'image.png'
 
+MEDIA_ROOT = tempfile.mkdtemp()
 
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
 class PostFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
         cls.user = User.objects.create_user(username=USERNAME)
         cls.post = Post.objects.create(
             text=TEST_POST_TEXT,
@@ -57,7 +75,7 @@ class PostFormTest(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
     def setUp(self):
@@ -87,6 +105,13 @@ class PostFormTest(TestCase):
         self.assertEqual(last_created_post.author, PostFormTest.user)
         self.assertEqual(last_created_post.group, form_data.get('group'))
         self.assertEqual(last_created_post.image, IMAGE_URL)
+        self.assertTrue(
+            last_created_post.image_placeholder.startswith(PLACEHOLDER_PREFIX)
+        )
+        self.assertEqual(
+            last_created_post.image_placeholder_source,
+            last_created_post.image.name
+        )
 
     def test_cant_create_empty_text(self):
         posts_count = Post.objects.count()
@@ -125,3 +150,166 @@ class PostFormTest(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertEqual(response.context['post'].text, EDIT_POST_TEXT)
         self.assertEqual(response.context['post'].image, EDIT_IMAGE_URL)
+
+    def test_edit_keeps_counters_changed_meanwhile(self):
+        """Редактирование не затирает счетчик, измененный параллельно."""
+        post = Post.objects.get(pk=PostFormTest.post.pk)
+        Post.objects.filter(pk=post.pk).update(comment_count=COMMENT_COUNT)
+        form = PostForm({'text': EDIT_POST_TEXT}, instance=post)
+        self.assertTrue(form.is_valid())
+        form.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, EDIT_POST_TEXT)
+        self.assertEqual(post.comment_count, COMMENT_COUNT)
+
+
+class ImageIngestionTest(TestCase):
+
+    @staticmethod
+    def get_upload(size, name=JPEG_NAME, exif=None):
+        content = BytesIO()
+        image = Image.new('RGB', size, (255, 0, 0))
+        if exif is None:
+            image.save(content, 'JPEG')
+        else:
+            image.save(content, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name=name,
+            content=content.getvalue(),
+            content_type=JPEG_CONTENT_TYPE
+        )
+
+    def test_large_image_downscaled_without_metadata(self):
+        """Большое изображение уменьшается, метаданные удаляются."""
+        exif = Image.Exif()
+        exif[EXIF_ARTIST_TAG] = EXIF_ARTIST
+        upload = ingest_image(self.get_upload((4000, 1000), exif=exif))
+        image = Image.open(upload)
+        self.assertEqual(upload.name, JPEG_NAME)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (IMAGE_MAX_SIZE, IMAGE_MAX_SIZE // 4))
+        self.assertNotIn('exif', image.info)
+
+    def test_orientation_applied_before_stripping(self):
+        """Поворот из EXIF применяется к изображению."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION_TAG] = 6
+        upload = ingest_image(self.get_upload((400, 200), exif=exif))
+        image = Image.open(upload)
+        self.assertEqual(image.size, (200, 400))
+
+    def test_small_image_without_metadata_kept(self):
+        """Небольшое изображение без метаданных сохраняется как есть."""
+        upload = self.get_upload((400, 200))
+        self.assertIs(ingest_image(upload), upload)
+
+    def test_too_many_pixels_rejected(self):
+        """Изображение с огромным числом пикселей отклоняется."""
+        with mock.patch('posts.images.IMAGE_MAX_PIXELS', 1000):
+            form = PostForm(
+                data={'text': TEST_POST_TEXT},
+                files={'image': self.get_upload((400, 200))}
+            )
+            self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_truncated_image_rejected(self):
+        """Обрезанный файл изображения отклоняется формой."""
+        for size in ((IMAGE_MAX_SIZE + 440, 200), (400, 200)):
+            upload = self.get_upload(size)
+            content = upload.read()
+            form = PostForm(
+                data={'text': TEST_POST_TEXT},
+                files={'image': SimpleUploadedFile(
+                    name=JPEG_NAME,
+                    content=content[:len(content) // 2],
+                    content_type=JPEG_CONTENT_TYPE
+                )}
+            )
+            with self.subTest(size=size):
+                self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors['image'], [BROKEN_IMAGE])
+
+    def test_placeholder_is_tiny_inline_image(self):
+        """Заглушка - крошечное изображение в пропорциях карточки."""
+        placeholder = make_placeholder(self.get_upload((2000, 1000)))
+        self.assertTrue(placeholder.startswith(PLACEHOLDER_PREFIX))
+        content = base64.b64decode(placeholder[len(PLACEHOLDER_PREFIX):])
+        self.assertEqual(Image.open(BytesIO(content)).size, PLACEHOLDER_SIZE)
+
+    def test_unwritable_format_reencoded_as_png(self):
+        """Формат, который Pillow не умеет записывать, сохраняется в PNG."""
+        width = IMAGE_MAX_SIZE + 440
+        xpm = (
+            '/* XPM */\nstatic char *image[] = {\n'
+            f'"{width} 1 1 1",\n"a c #FF0000",\n"{"a" * width}"\n}};\n'
+        ).encode()
+        form = PostForm(
+            data={'text': TEST_POST_TEXT},
+            files={'image': SimpleUploadedFile(
+                name=XPM_NAME,
+                content=xpm,
+                content_type='image/x-xpixmap'
+            )}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        upload = form.cleaned_data['image']
+        self.assertEqual(upload.name, PNG_NAME)
+        image = Image.open(upload)
+        self.assertEqual(image.format, 'PNG')
+        self.assertEqual(image.width, IMAGE_MAX_SIZE)
+
+    def test_animated_image_downscaled(self):
+        """Каждый кадр большого анимированного изображения уменьшается."""
+        frames = [
+            Image.new('P', (IMAGE_MAX_SIZE * 2, 100), color)
+            for color in (1, 2)
+        ]
+        content = BytesIO()
+        frames[0].save(
+            content,
+            'GIF',
+            save_all=True,
+            append_images=frames[1:],
+            duration=100
+        )
+        image = Image.open(ingest_image(SimpleUploadedFile(
+            name=IMAGE_NAME,
+            content=content.getvalue(),
+            content_type=CONTENT_TYPE
+        )))
+        self.assertEqual(image.format, 'GIF')
+        self.assertEqual(image.n_frames, 2)
+        self.assertEqual(image.size, (IMAGE_MAX_SIZE, 50))
+
+
+class CreationFormTest(TestCase):
+
+    def test_reserved_username_rejected(self):
+        """Нельзя зарегистрироваться с именем, занятым страницей сайта."""
+        for username in ('api', 'Search'):
+            with self.subTest(username=username):
+                form = CreationForm(data={
+                    'username': username,
+                    'password1': PASSWORD,
+                    'password2': PASSWORD,
+                })
+                self.assertIn('username', form.errors)
+        self.assertFalse(User.objects.exists())
+
+    def test_site_pages_reserved(self):
+        """Все адреса первого уровня заняты для имен пользователей."""
+        def get_prefixes(patterns, prefix=''):
+            for pattern in patterns:
+                route = prefix + str(pattern.pattern)
+                if isinstance(pattern, URLPattern):
+                    segment = route.split('/')[0]
+                    if segment and '<' not in segment:
+                        yield segment
+                else:
+                    yield from get_prefixes(pattern.url_patterns, route)
+
+        self.assertLessEqual(
+            set(get_prefixes(get_resolver().url_patterns)),
+            set(RESERVED_USERNAMES)
+        )
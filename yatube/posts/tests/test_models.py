@@ -1,6 +1,8 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Comment, Group, Follow, Post, User
+from posts.models import Comment, Follow, Group, Post, User
 
 
 USER = 'test_user'
@@ -10,6 +12,7 @@ GROUP_SLUG = 'test_slug'
 GROUP_DESCRIPTION = 'test_description'
 POST_TEXT = 'Тестовый текст поста'
 COMMENT_TEXT = 'Тестовый текст комментария'
+COMMENTS_COUNT = 20
 
 
 class PostsModelTest(TestCase):
@@ -62,3 +65,59 @@ class PostsModelTest(TestCase):
         follow = PostsModelTest.follow
         expected_object_name = f'{USER} followed {AUTHOR}'
         self.assertEqual(expected_object_name, str(follow))
+
+    def test_comment_count_follows_comments(self):
+        """Счетчик комментариев меняется при добавлении и удалении."""
+        post = Post.objects.create(text=POST_TEXT, author=self.user)
+        comment = Comment.objects.create(
+            text=COMMENT_TEXT,
+            author=self.user,
+            post=post,
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_post_delete_skips_comment_bookkeeping(self):
+        """Удаление поста не обновляет его счетчик по каждому комментарию."""
+        post = Post.objects.create(text=POST_TEXT, author=self.user)
+        Comment.objects.bulk_create(
+            Comment(text=COMMENT_TEXT, author=self.user, post=post)
+            for _ in range(COMMENTS_COUNT)
+        )
+        pk = post.pk
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse(Comment.objects.filter(post_id=pk))
+        self.assertLess(len(queries), COMMENTS_COUNT)
+        self.assertFalse(
+            [query for query in queries if 'UPDATE' in query['sql']]
+        )
+
+    def test_feeds_read_posts_in_index_order(self):
+        """Ленты автора и комментарии читаются по индексу без сортировки."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('План проверяется только для SQLite.')
+        querysets = (
+            (
+                Post.objects.filter(author=self.user).order_by(
+                    '-pub_date',
+                    '-pk'
+                ),
+                'post_author_pub_date_idx'
+            ),
+            (self.post.comments.all(), 'comment_post_created_idx'),
+            (
+                Follow.objects.filter(author=self.author, fan_out=True).values(
+                    'user_id'
+                ),
+                'follow_author_fan_out_idx'
+            ),
+        )
+        for queryset, index in querysets:
+            with self.subTest(index=index):
+                plan = queryset.explain()
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
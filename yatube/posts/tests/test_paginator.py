@@ -1,13 +1,23 @@
+from http import HTTPStatus
+from unittest import mock
+
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Post, User
+from posts.models import Comment, Group, Post, User
 
 
 HOMEPAGE_URL = reverse('index')
 USERNAME = 'test'
+GROUP_SLUG = 'test_slug'
 TEST_POST_TEXT = 'Тестовый текст поста'
+GROUP_URL = reverse('group_posts', args=(GROUP_SLUG,))
+PROFILE_URL = reverse('profile', args=(USERNAME,))
+COMMENT_TEXT = 'Тестовый текст комментария'
+COMMENTS_PAGE_SIZE = 3
 
 
 class PaginatorViewsTest(TestCase):
@@ -16,6 +26,11 @@ class PaginatorViewsTest(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_SLUG,
+            slug=GROUP_SLUG,
+            description=GROUP_SLUG
+        )
 
     def setUp(self):
         self.client = Client()
@@ -23,7 +38,8 @@ class PaginatorViewsTest(TestCase):
             [
                 Post(
                     text=TEST_POST_TEXT,
-                    author=PaginatorViewsTest.user
+                    author=PaginatorViewsTest.user,
+                    group=PaginatorViewsTest.group
                 )
             ] * 11
         )
@@ -35,3 +51,108 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context.get('page').object_list), 10)
         response = self.client.get(reverse('index') + '?page=2')
         self.assertEqual(len(response.context.get('page').object_list), 1)
+
+    def test_cursor_pages_walk_whole_feed(self):
+        """Курсорная пагинация проходит ленту вперед и назад без пропусков."""
+        all_ids = list(Post.objects.order_by('-pub_date', '-pk').values_list(
+            'pk', flat=True
+        ))
+        for url in (HOMEPAGE_URL, GROUP_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                first_page = self.client.get(url).context['page']
+                next_cursor = first_page.paginator.next_cursor
+                self.assertIsNone(first_page.paginator.previous_cursor)
+                self.assertIsNotNone(next_cursor)
+                second_page = self.client.get(
+                    f'{url}?after={next_cursor}'
+                ).context['page']
+                self.assertEqual(
+                    [post.pk for post in first_page]
+                    + [post.pk for post in second_page],
+                    all_ids
+                )
+                self.assertIsNone(second_page.paginator.next_cursor)
+                previous_page = self.client.get(
+                    f'{url}?before={second_page.paginator.previous_cursor}'
+                ).context['page']
+                self.assertEqual(
+                    [post.pk for post in previous_page],
+                    [post.pk for post in first_page]
+                )
+
+    def test_cursor_page_skips_count_query(self):
+        """Курсорная страница не считает количество постов."""
+        response = self.client.get(GROUP_URL)
+        next_cursor = response.context['page'].paginator.next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{GROUP_URL}?after={next_cursor}')
+        self.assertEqual(len(response.context['page']), 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор показывает первую страницу."""
+        response = self.client.get(f'{GROUP_URL}?after=broken')
+        self.assertEqual(len(response.context['page']), 10)
+
+
+@mock.patch('posts.views.COMMENTS_PAGINATE_BY', COMMENTS_PAGE_SIZE)
+class CommentsPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(text=TEST_POST_TEXT, author=cls.user)
+        for _ in range(COMMENTS_PAGE_SIZE + 1):
+            Comment.objects.create(
+                text=COMMENT_TEXT,
+                author=cls.user,
+                post=cls.post
+            )
+        cls.POST_URL = reverse('post', args=(USERNAME, cls.post.pk))
+        cls.COMMENTS_URL = reverse(
+            'post_comments',
+            args=(USERNAME, cls.post.pk)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_comments_loaded_by_pages(self):
+        """Комментарии поста подгружаются страницами без пропусков."""
+        all_ids = list(
+            CommentsPaginatorTest.post.comments.order_by(
+                '-created', '-pk'
+            ).values_list('pk', flat=True)
+        )
+        response = self.client.get(CommentsPaginatorTest.POST_URL)
+        first_page = response.context['comments']
+        next_cursor = first_page.paginator.next_cursor
+        self.assertEqual(len(first_page), COMMENTS_PAGE_SIZE)
+        self.assertContains(response, next_cursor)
+        response = self.client.get(
+            f'{CommentsPaginatorTest.COMMENTS_URL}?after={next_cursor}'
+        )
+        second_page = response.context['comments']
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertEqual(
+            [comment.pk for comment in first_page]
+            + [comment.pk for comment in second_page],
+            all_ids
+        )
+        self.assertIsNone(second_page.paginator.next_cursor)
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_comments_of_missing_post_not_found(self):
+        """Комментарии чужого или несуществующего поста не найдены."""
+        url = reverse(
+            'post_comments',
+            args=('missing', CommentsPaginatorTest.post.pk)
+        )
+        self.assertEqual(
+            self.client.get(url).status_code,
+            HTTPStatus.NOT_FOUND
+        )
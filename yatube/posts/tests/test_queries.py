@@ -0,0 +1,111 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import QueryBudgetMixin
+
+
+AUTHOR = 'author'
+READER = 'reader'
+GROUP_SLUG = 'test_slug'
+POST_TEXT = 'Тестовый текст поста'
+COMMENT_TEXT = 'Тестовый текст комментария'
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.reader = User.objects.create_user(username=READER)
+        cls.group = Group.objects.create(
+            title=GROUP_SLUG,
+            slug=GROUP_SLUG,
+            description=GROUP_SLUG
+        )
+        cls.post = Post.objects.create(
+            text=POST_TEXT,
+            author=cls.author,
+            group=cls.group
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(QueryBudgetTest.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryBudgetTest.reader)
+
+    def seed(self, size):
+        author = QueryBudgetTest.author
+        for _ in range(size - author.posts.count()):
+            Post.objects.create(
+                text=POST_TEXT,
+                author=author,
+                group=QueryBudgetTest.group
+            )
+        post = QueryBudgetTest.post
+        for _ in range(size - post.comments.count()):
+            commentator = User.objects.create_user(
+                username=f'commentator_{User.objects.count()}'
+            )
+            Comment.objects.create(
+                text=COMMENT_TEXT,
+                author=commentator,
+                post=post
+            )
+
+    def test_posts_views_query_budget(self):
+        """Число запросов страниц posts не зависит от объема данных."""
+        post_args = (AUTHOR, QueryBudgetTest.post.pk)
+        budgets = (
+            (self.guest_client, reverse('index'), 1),
+            (self.guest_client, reverse('group_posts', args=(GROUP_SLUG,)), 2),
+            (self.guest_client, reverse('profile', args=(AUTHOR,)), 5),
+            (self.guest_client, reverse('post', args=post_args), 6),
+            (
+                self.guest_client,
+                reverse('post_comments', args=post_args),
+                2
+            ),
+            (self.guest_client, f"{reverse('search')}?q=текст", 3),
+            (self.guest_client, reverse('api_index'), 1),
+            (
+                self.guest_client,
+                reverse('api_group_posts', args=(GROUP_SLUG,)),
+                2
+            ),
+            (self.guest_client, reverse('api_profile', args=(AUTHOR,)), 2),
+            (self.guest_client, reverse('api_post', args=post_args), 2),
+            (self.reader_client, reverse('api_follow_index'), 4),
+            (self.reader_client, reverse('index'), 3),
+            (self.reader_client, reverse('follow_index'), 4),
+            (self.reader_client, reverse('new_post'), 3),
+            (self.reader_client, reverse('profile', args=(AUTHOR,)), 8),
+            (self.reader_client, reverse('post', args=post_args), 9),
+            (self.reader_client, reverse('add_comment', args=post_args), 9),
+            (self.author_client, reverse('post_edit', args=post_args), 5),
+        )
+        self.assertQueryBudgets(budgets)
+
+    def test_follow_views_query_budget(self):
+        """Число запросов подписки и отписки не зависит от объема данных."""
+        unfollow_url = reverse('profile_unfollow', args=(AUTHOR,))
+        follow_url = reverse('profile_follow', args=(AUTHOR,))
+        budgets = (
+            (self.reader_client, unfollow_url, 7),
+            (self.reader_client, follow_url, 8),
+        )
+        self.assertQueryBudgets(budgets)
+
+    def test_users_and_about_views_query_budget(self):
+        """Число запросов страниц users и about не зависит от объема данных."""
+        budgets = (
+            (self.guest_client, reverse('signup'), 0),
+            (self.guest_client, reverse('about:author'), 0),
+            (self.guest_client, reverse('about:tech'), 0),
+            (self.reader_client, reverse('about:author'), 2),
+        )
+        self.assertQueryBudgets(budgets)
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import search_post_ids
+
+
+SEARCH_URL = reverse('search')
+ADMIN_URL = reverse('admin:posts_post_changelist')
+USERNAME = 'test'
+ADMIN_USERNAME = 'admin'
+FIRST_POST_TEXT = 'Путешествие на Байкал зимой'
+SECOND_POST_TEXT = 'Рецепт пирога с яблоками'
+EDITED_POST_TEXT = 'Рецепт пирога с грушами'
+RELEVANT_POST_TEXT = 'Байкал, Байкал, Байкал'
+PAGINATE_BY = 2
+PAGED_POSTS_COUNT = 5
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.first_post = Post.objects.create(
+            text=FIRST_POST_TEXT,
+            author=cls.user,
+        )
+        cls.second_post = Post.objects.create(
+            text=SECOND_POST_TEXT,
+            author=cls.user,
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_search_finds_matching_posts(self):
+        """Поиск находит только посты с искомыми словами."""
+        response = self.client.get(SEARCH_URL, {'q': 'байкал'})
+        self.assertEqual(
+            list(response.context.get('page').object_list),
+            [SearchTest.first_post]
+        )
+        self.assertEqual(response.context.get('query'), 'байкал')
+
+    def test_search_matches_all_words(self):
+        """Пост находится, только если в нем есть все слова запроса."""
+        self.assertEqual(
+            search_post_ids('рецепт пирога'),
+            [SearchTest.second_post.pk]
+        )
+        self.assertEqual(search_post_ids('рецепт байкал'), [])
+
+    def test_empty_query_returns_nothing(self):
+        """Пустой запрос ничего не находит."""
+        response = self.client.get(SEARCH_URL, {'q': ' '})
+        self.assertEqual(len(response.context.get('page').object_list), 0)
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(text=SECOND_POST_TEXT, author=self.user)
+        post.text = EDITED_POST_TEXT
+        post.save()
+        self.assertEqual(search_post_ids('грушами'), [post.pk])
+        self.assertNotIn(post.pk, search_post_ids('яблоками'))
+        post.delete()
+        self.assertEqual(search_post_ids('грушами'), [])
+
+    def test_search_pages_reach_every_match(self):
+        """Страницы поиска охватывают все найденные посты."""
+        posts = [
+            Post.objects.create(text=SECOND_POST_TEXT, author=self.user)
+            for _ in range(PAGED_POSTS_COUNT - 1)
+        ] + [SearchTest.second_post]
+        found = []
+        with mock.patch('posts.views.PAGINATE_BY', PAGINATE_BY):
+            for number in range(1, 4):
+                response = self.client.get(
+                    SEARCH_URL,
+                    {'q': 'пирога', 'page': number}
+                )
+                page = response.context.get('page')
+                found.extend(page.object_list)
+        self.assertEqual(page.paginator.count, PAGED_POSTS_COUNT)
+        self.assertEqual(page.paginator.num_pages, 3)
+        self.assertCountEqual(found, posts)
+
+    def log_in_admin(self):
+        admin = get_user_model().objects.create_superuser(
+            username=ADMIN_USERNAME,
+            password=ADMIN_USERNAME,
+        )
+        self.client.force_login(admin)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке использует полнотекстовый индекс."""
+        self.log_in_admin()
+        response = self.client.get(ADMIN_URL, {'q': 'Байкал'})
+        self.assertEqual(
+            list(response.context.get('cl').result_list),
+            [SearchTest.first_post]
+        )
+
+    def test_admin_search_lists_most_relevant_first(self):
+        """Админка показывает найденные посты по убыванию релевантности."""
+        relevant = Post.objects.create(
+            text=RELEVANT_POST_TEXT,
+            author=self.user,
+        )
+        # Newer posts are listed first without the ranking.
+        Post.objects.filter(pk=relevant.pk).update(
+            pub_date=SearchTest.first_post.pub_date - timedelta(days=1)
+        )
+        self.log_in_admin()
+        response = self.client.get(ADMIN_URL, {'q': 'Байкал'})
+        self.assertEqual(
+            list(response.context.get('cl').result_list),
+            [relevant, SearchTest.first_post]
+        )
+
+
+class SearchFlushTest(TransactionTestCase):
+
+    def test_flush_empties_index(self):
+        """После flush в индексе не остается постов из прошлых тестов."""
+        user = User.objects.create_user(username=USERNAME)
+        Post.objects.create(text=FIRST_POST_TEXT, author=user)
+        call_command('flush', interactive=False, verbosity=0)
+        self.assertEqual(search_post_ids('байкал'), [])
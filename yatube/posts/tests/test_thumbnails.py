@@ -0,0 +1,220 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.kvstore import KVStore
+from posts.models import Post, User
+from posts.tasks import run_in_background
+from posts.templatetags.post_thumbnails import EAGER_CARDS
+from posts.thumbnails import (THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS, backend,
+                              get_current_placeholder, get_current_variants,
+                              make_post_images, needs_images)
+
+
+TEST_USERNAME = 'test'
+POST_TEXT = 'Тестовый текст поста'
+PROFILE_URL = reverse('profile', args=(TEST_USERNAME,))
+IMAGE_NAME = 'big.png'
+IMAGE_SIZE = (1000, 400)
+MISSING_IMAGE = 'posts/missing.png'
+CONTENT_TYPE = 'image/png'
+PLACEHOLDER = 'card-img bg-light'
+PICTURE = '<picture'
+WEBP_SOURCE = 'type="image/webp"'
+LAZY_LOADING = 'loading="lazy"'
+INLINE_PREVIEW = 'url(data:image/jpeg;base64,'
+MEDIA_ROOT = tempfile.mkdtemp()
+PAGE_SIZE = 10
+FEED = Template(
+    '{% load post_thumbnails %}'
+    '{% preload_post_images posts %}'
+    '{% for post in posts %}{% post_image post %}{% endfor %}'
+)
+
+
+def get_image_content():
+    content = BytesIO()
+    Image.new('RGB', IMAGE_SIZE, (255, 0, 0)).save(content, 'PNG')
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.image_content = get_image_content()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            text=POST_TEXT,
+            author=ThumbnailTest.user,
+            image=SimpleUploadedFile(
+                name=IMAGE_NAME,
+                content=ThumbnailTest.image_content,
+                content_type=CONTENT_TYPE
+            )
+        )
+
+    def test_page_shows_placeholder_until_images_ready(self):
+        """Пока варианты изображения не готовы, показывается заглушка."""
+        post = self.create_post()
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, PLACEHOLDER)
+        self.assertNotContains(response, PICTURE)
+        self.assertTrue(make_post_images(post.pk, post.image.name))
+        response = self.client.get(
+            PROFILE_URL,
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, PICTURE)
+        self.assertContains(response, WEBP_SOURCE)
+        self.assertNotContains(response, PLACEHOLDER)
+
+    def test_first_cards_not_lazy(self):
+        """Изображения первых карточек страницы загружаются сразу."""
+        posts = [self.create_post() for _ in range(EAGER_CARDS + 1)]
+        for post in posts:
+            make_post_images(post.pk, post.image.name)
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, PICTURE, count=len(posts))
+        self.assertContains(response, LAZY_LOADING, count=1)
+
+    def test_variants_cover_widths_without_upscale(self):
+        """Варианты создаются в WebP и JPEG и не шире исходника."""
+        post = self.create_post()
+        make_post_images(post.pk, post.image.name)
+        variants = get_current_variants(Post.objects.get(pk=post.pk))
+        for image_format in ('webp', 'jpeg'):
+            with self.subTest(image_format=image_format):
+                widths = [
+                    variant['width'] for variant in variants
+                    if variant['format'] == image_format
+                ]
+                self.assertEqual(widths, [320, 480, 640, 960, 1000])
+
+    def test_placeholder_made_for_posts_saved_without_form(self):
+        """Заглушка создается в фоне для постов, сохраненных не формой."""
+        post = self.create_post()
+        self.assertEqual(post.image_placeholder, '')
+        make_post_images(post.pk, post.image.name)
+        response = self.client.get(PROFILE_URL)
+        self.assertContains(response, INLINE_PREVIEW)
+
+    def test_placeholder_made_again_for_new_image(self):
+        """Заглушка старого изображения не показывается для нового."""
+        post = self.create_post()
+        make_post_images(post.pk, post.image.name)
+        post = Post.objects.get(pk=post.pk)
+        post.image = self.create_post().image
+        post.save()
+        self.assertEqual(get_current_placeholder(post), '')
+        self.assertTrue(needs_images(post))
+        self.assertTrue(make_post_images(post.pk, post.image.name))
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.image_placeholder_source, post.image.name)
+        self.assertFalse(needs_images(post))
+
+    def test_ready_images_not_generated_again(self):
+        """Готовые варианты не создаются повторно."""
+        post = self.create_post()
+        make_post_images(post.pk, post.image.name)
+        updated = Post.objects.get(pk=post.pk).updated
+        self.assertFalse(make_post_images(post.pk, post.image.name))
+        self.assertEqual(Post.objects.get(pk=post.pk).updated, updated)
+
+    def test_missing_image_not_marked_ready(self):
+        """Варианты отсутствующего файла не считаются готовыми."""
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(image=MISSING_IMAGE)
+        self.assertFalse(make_post_images(post.pk, MISSING_IMAGE))
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {})
+
+    def test_saved_image_scheduled_after_commit(self):
+        """После сохранения поста варианты изображения создаются в фоне."""
+        with mock.patch('posts.tasks.executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        executor.submit.assert_called_once_with(
+            run_in_background,
+            make_post_images,
+            post.pk,
+            post.image.name
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class KVStoreTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        for number in range(PAGE_SIZE):
+            Post.objects.create(
+                text=POST_TEXT,
+                author=cls.user,
+                image=f'posts/legacy_{number}.jpg'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.stored_kvstore = default.kvstore._wrapped
+        default.kvstore._wrapped = KVStore()
+        self.posts = list(Post.objects.all())
+        for post in self.posts:
+            source = ImageFile(post.image)
+            source.set_size((1000, 400))
+            default.kvstore.set(source)
+            thumbnail = backend.get_thumbnail_file(
+                post.image,
+                THUMBNAIL_GEOMETRY,
+                **THUMBNAIL_OPTIONS
+            )
+            thumbnail.set_size((960, 339))
+            default.kvstore.set(thumbnail, source)
+        cache.clear()
+        default.kvstore._wrapped = KVStore()
+
+    def tearDown(self):
+        default.kvstore._wrapped = self.stored_kvstore
+
+    def test_page_thumbnails_resolved_at_once(self):
+        """Миниатюры страницы находятся одним запросом, затем из памяти."""
+        with CaptureQueriesContext(connection) as queries:
+            html = FEED.render(Context({'posts': self.posts}))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(html.count('<img class="card-img"'), PAGE_SIZE)
+        with CaptureQueriesContext(connection) as queries:
+            FEED.render(Context({'posts': self.posts}))
+        self.assertEqual(len(queries), 0)
+
+    def test_lru_size_bounded(self):
+        """Хранилище держит в памяти не больше заданного числа записей."""
+        with mock.patch('posts.kvstore.THUMBNAIL_LRU_SIZE', 2):
+            FEED.render(Context({'posts': self.posts}))
+        self.assertEqual(len(default.kvstore._entries), 2)
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+FOLLOWER = 'follower'
+AUTHOR = 'author'
+MERGED_AUTHOR = 'merged_author'
+POST_TEXT = 'Тестовый текст поста'
+BACKFILL = 3
+FOLLOW_URL = reverse('follow_index')
+AUTHOR_FOLLOW_URL = reverse('profile_follow', args=(AUTHOR,))
+AUTHOR_UNFOLLOW_URL = reverse('profile_unfollow', args=(AUTHOR,))
+
+
+class TimelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username=FOLLOWER)
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.merged_author = User.objects.create_user(username=MERGED_AUTHOR)
+        cls.old_post = Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTest.follower)
+
+    def timeline(self):
+        return list(
+            TimelineTest.follower.timeline.values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка заполняет ленту, отписка очищает ее."""
+        self.authorized_client.get(AUTHOR_FOLLOW_URL)
+        self.assertEqual(self.timeline(), [TimelineTest.old_post.pk])
+        self.authorized_client.get(AUTHOR_UNFOLLOW_URL)
+        self.assertEqual(self.timeline(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост доставляется в ленты подписчиков."""
+        Follow.objects.create(
+            user=TimelineTest.follower,
+            author=TimelineTest.author
+        )
+        post = Post.objects.create(text=POST_TEXT, author=TimelineTest.author)
+        self.assertEqual(
+            self.timeline(),
+            [post.pk, TimelineTest.old_post.pk]
+        )
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertEqual(list(response.context['page']), [
+            post,
+            TimelineTest.old_post
+        ])
+
+    def test_merged_author_posts_are_read_from_posts(self):
+        """Посты авторов без доставки в ленту подмешиваются при чтении."""
+        Follow.objects.create(
+            user=TimelineTest.follower,
+            author=TimelineTest.author
+        )
+        Follow.objects.create(
+            user=TimelineTest.follower,
+            author=TimelineTest.merged_author
+        )
+        Follow.objects.filter(author=TimelineTest.merged_author).update(
+            fan_out=False
+        )
+        Post.objects.bulk_create(
+            [Post(text=POST_TEXT, author=TimelineTest.merged_author)] * 10
+        )
+        merged_posts = TimelineTest.merged_author.posts.all()
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                author=TimelineTest.merged_author
+            ).exists()
+        )
+        first_page = self.authorized_client.get(FOLLOW_URL).context['page']
+        next_cursor = first_page.paginator.next_cursor
+        second_page = self.authorized_client.get(
+            f'{FOLLOW_URL}?after={next_cursor}'
+        ).context['page']
+        shown_posts = list(first_page) + list(second_page)
+        self.assertEqual(
+            {post.pk for post in shown_posts},
+            {post.pk for post in merged_posts} | {TimelineTest.old_post.pk}
+        )
+        self.assertEqual(len(second_page), 1)
+
+    def test_posts_older_than_backfill_are_read_from_posts(self):
+        """Посты старше заполненной части ленты подмешиваются при чтении."""
+        Post.objects.bulk_create(
+            Post(text=POST_TEXT, author=TimelineTest.author)
+            for _ in range(12)
+        )
+        with mock.patch('posts.timeline.TIMELINE_BACKFILL', BACKFILL):
+            self.authorized_client.get(AUTHOR_FOLLOW_URL)
+        self.assertEqual(len(self.timeline()), BACKFILL)
+        self.assertIsNotNone(
+            Follow.objects.get(author=TimelineTest.author).timeline_since
+        )
+        shown_posts = []
+        url = FOLLOW_URL
+        while url:
+            page = self.authorized_client.get(url).context['page']
+            shown_posts.extend(post.pk for post in page)
+            next_cursor = page.paginator.next_cursor
+            url = next_cursor and f'{FOLLOW_URL}?after={next_cursor}'
+        self.assertEqual(len(shown_posts), 13)
+        self.assertEqual(
+            shown_posts,
+            list(TimelineTest.author.posts.order_by(
+                '-pub_date',
+                '-pk'
+            ).values_list('pk', flat=True))
+        )
@@ -4,10 +4,9 @@ import tempfile
 from django import forms
 from http import HTTPStatus
 
-from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Group, Post, User
@@ -43,12 +42,14 @@ IMAGE_NAME = 'small.gif'
 IMAGE_URL = f'posts/{IMAGE_NAME}'
 CONTENT_TYPE = 'image/gif'
 
+MEDIA_ROOT = tempfile.mkdtemp()
 
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
 class PostsPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
         cls.uploaded = SimpleUploadedFile(
             name=IMAGE_NAME,
             content=SMALL_GIF,
@@ -96,7 +97,7 @@ class PostsPagesTests(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
     def setUp(self):
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+DATA_SIZES = (1, 10, 100)
+
+
+class QueryBudgetMixin:
+    """Helps to check that views issue a bounded number of queries.
+
+    ``seed(size)`` must grow the test data to ``size`` rows of every kind,
+    then ``assertQueryBudgets`` requests every url once per data size and
+    fails if the number of queries changes with the data or exceeds the
+    budget.
+    """
+    data_sizes = DATA_SIZES
+
+    def seed(self, size):
+        raise NotImplementedError
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertLess(response.status_code, 400, url)
+        return len(queries), queries.captured_queries
+
+    def assertQueryBudgets(self, budgets):
+        """Checks ``(client, url, budget)`` triples against every data size."""
+        counts = [{} for _ in budgets]
+        for size in self.data_sizes:
+            self.seed(size)
+            for (client, url, budget), url_counts in zip(budgets, counts):
+                count, captured = self.count_queries(client, url)
+                url_counts[size] = count
+                queries = '\n'.join(query['sql'] for query in captured)
+                self.assertLessEqual(
+                    count,
+                    budget,
+                    f'{url}: {count} queries on {size} rows, budget is '
+                    f'{budget}:\n{queries}'
+                )
+        for (_, url, _), url_counts in zip(budgets, counts):
+            self.assertEqual(
+                len(set(url_counts.values())),
+                1,
+                f'{url}: number of queries grows with data: {url_counts}'
+            )
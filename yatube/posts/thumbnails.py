@@ -0,0 +1,189 @@
+"""Posts app thumbnails file
+
+Every post image is turned into a set of variants of several widths in
+WebP and JPEG, described in ``Post.image_variants``. They are generated in
+the background after the post is saved (see ``posts.tasks``) or by the
+``generate_thumbnails`` command. Pages only read the descriptions and never
+run image processing themselves. Posts whose variants aren't ready yet show
+the single sorl thumbnail if it was made before, or a placeholder.
+
+The inline placeholder is made by the post form on upload, the background
+task makes it for posts saved otherwise. Like the variants it remembers the
+image it was made of and is made again when the image is replaced.
+"""
+from django.utils import timezone
+from sorl.thumbnail import base, default
+from sorl.thumbnail.images import ImageFile
+
+from yatube.metrics import THUMBNAILS_GENERATED
+
+from .cache import bump_content_version
+from .conditional import get_post_scopes
+from .images import make_placeholder
+from .models import Post
+
+
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+VARIANT_WIDTHS = (320, 480, 640, 960, 1280, 1920)
+VARIANT_RATIO = 339 / 960
+VARIANT_FORMATS = ('WEBP', 'JPEG')
+VARIANT_QUALITY = {'WEBP': 80, 'JPEG': 85}
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Thumbnail backend able to tell if a thumbnail was generated."""
+
+    def set_default_options(self, source, options):
+        """Fills ``options`` the same way ``get_thumbnail`` does."""
+        if base.settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(base.settings, attr)
+            if value != getattr(base.default_settings, attr):
+                options.setdefault(key, value)
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Returns thumbnail ``get_thumbnail`` would make without making it."""
+        source = ImageFile(file_)
+        self.set_default_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def _create_thumbnail(self, *args, **kwargs):
+        super()._create_thumbnail(*args, **kwargs)
+        THUMBNAILS_GENERATED.inc()
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Returns thumbnail if it exists, None instead of generating it."""
+        return default.kvstore.get(
+            self.get_thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+backend = ThumbnailBackend()
+
+
+def get_post_thumbnail(image):
+    """Returns ready single-size thumbnail of post image or None."""
+    if not image:
+        return None
+    return backend.get_ready_thumbnail(
+        image,
+        THUMBNAIL_GEOMETRY,
+        **THUMBNAIL_OPTIONS
+    )
+
+
+def preload_post_thumbnails(posts):
+    """Resolves single-size thumbnails of posts lacking variants at once."""
+    files = [
+        backend.get_thumbnail_file(
+            post.image,
+            THUMBNAIL_GEOMETRY,
+            **THUMBNAIL_OPTIONS
+        )
+        for post in posts
+        if post.image and get_current_variants(post) is None
+    ]
+    if files and hasattr(default.kvstore, 'preload'):
+        default.kvstore.preload(files)
+
+
+def get_current_variants(post):
+    """Returns variants of post image unless they were made for another."""
+    variants = post.image_variants or {}
+    if post.image and variants.get('source') == post.image.name:
+        return variants['images']
+    return None
+
+
+def get_current_placeholder(post):
+    """Returns placeholder of post image unless it was made for another."""
+    if post.image and post.image_placeholder_source == post.image.name:
+        return post.image_placeholder
+    return ''
+
+
+def needs_images(post):
+    """Tells if variants or placeholder of post image must be made."""
+    return bool(post.image) and (
+        get_current_variants(post) is None
+        or not get_current_placeholder(post)
+    )
+
+
+def make_variants(name):
+    """Generates every variant of image, returns their descriptions.
+
+    Images are cropped to the card ratio and never upscaled, so widths the
+    source can't provide are skipped. Returns an empty list if the source
+    is missing or broken.
+    """
+    variants = []
+    for image_format in VARIANT_FORMATS:
+        widths = set()
+        for width in VARIANT_WIDTHS:
+            thumbnail = backend.get_thumbnail(
+                name,
+                f'{width}x{round(width * VARIANT_RATIO)}',
+                crop='center',
+                upscale=False,
+                format=image_format,
+                quality=VARIANT_QUALITY[image_format],
+            )
+            # sorl returns a thumbnail which was never created if the source
+            # is missing or broken.
+            if not thumbnail.exists():
+                return []
+            if thumbnail.width in widths:
+                break
+            widths.add(thumbnail.width)
+            variants.append({
+                'format': image_format.lower(),
+                'name': thumbnail.name,
+                'width': thumbnail.width,
+                'height': thumbnail.height,
+            })
+    return variants
+
+
+def make_post_images(pk, name):
+    """Makes missing variants and placeholder of post image.
+
+    Tells if anything was made. The post gets a new modification time, so
+    its cached card showing the placeholder is replaced by the one with the
+    picture.
+    """
+    post = Post.objects.filter(pk=pk, image=name).only(
+        'author',
+        'group',
+        'image',
+        'image_variants',
+        'image_placeholder',
+        'image_placeholder_source'
+    ).first()
+    if post is None or not needs_images(post):
+        return False
+    changes = {}
+    variants = get_current_variants(post)
+    if variants is None:
+        variants = make_variants(name)
+        if not variants:
+            return False
+        changes['image_variants'] = {'source': name, 'images': variants}
+    if not get_current_placeholder(post):
+        smallest = min(variants, key=lambda variant: variant['width'])
+        with default.storage.open(smallest['name']) as file:
+            changes['image_placeholder'] = make_placeholder(file)
+        changes['image_placeholder_source'] = name
+    if Post.objects.filter(pk=pk, image=name).update(
+        updated=timezone.now(),
+        **changes
+    ):
+        bump_content_version(
+            *get_post_scopes(pk, post.author_id, post.group_id)
+        )
+    return True
@@ -0,0 +1,162 @@
+"""Posts app follow timelines file
+
+Posts are copied into the timeline of every follower when they are
+published, so the follow feed is read by a single range scan of the
+``(user, pub_date)`` index. Authors who got more than
+``TIMELINE_FANOUT_LIMIT`` followers don't fan out to the newer ones: their
+posts are merged into the feed when it is read.
+
+A new follow copies only the latest ``TIMELINE_BACKFILL`` posts of the
+author. ``Follow.timeline_since`` then keeps the date of the oldest copied
+one and the older posts are merged in the same way.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry
+from .paginator import CursorPaginator, get_page
+
+
+PAGINATE_BY = settings.PAGINATE_BY
+TIMELINE_FANOUT_LIMIT = settings.TIMELINE_FANOUT_LIMIT
+TIMELINE_BACKFILL = settings.TIMELINE_BACKFILL
+BATCH_SIZE = 1000
+
+
+def should_fan_out(author_id):
+    """Tells if one more follower of author can be served by fan-out."""
+    fan_out_followers = Follow.objects.filter(
+        author_id=author_id,
+        fan_out=True
+    )[:TIMELINE_FANOUT_LIMIT]
+    return fan_out_followers.count() < TIMELINE_FANOUT_LIMIT
+
+
+def fan_out_post(post):
+    """Delivers new post to the timelines of author's followers."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+        fan_out=True
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                author_id=post.author_id,
+                post_id=post.pk,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(follow):
+    """Copies latest posts of followed author to the follower's timeline."""
+    posts = list(
+        Post.objects.filter(author_id=follow.author_id).order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', 'pub_date')[:TIMELINE_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=follow.user_id,
+                author_id=follow.author_id,
+                post_id=pk,
+                pub_date=pub_date,
+            )
+            for pk, pub_date in posts
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if len(posts) == TIMELINE_BACKFILL:
+        Follow.objects.filter(pk=follow.pk).update(
+            timeline_since=posts[-1][1]
+        )
+
+
+def prune_timeline(follow):
+    """Removes posts of unfollowed author from the follower's timeline."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id
+    ).delete()
+
+
+def get_post_key(post):
+    return post.pub_date, post.pk
+
+
+def merge_rows(sources, per_page, before, key=get_post_key):
+    """Merges rows of several keyset pages into one page worth of rows.
+
+    Rows are ordered and told apart by ``key(row)``, a ``(pub_date, pk)``
+    pair.
+    """
+    posts = {key(post): post for rows, _, _ in sources for post in rows}
+    rows = sorted(posts.values(), key=key, reverse=True)
+    has_previous = any(source[1] for source in sources)
+    has_next = any(source[2] for source in sources)
+    if before:
+        has_previous = has_previous or len(rows) > per_page
+        return rows[-per_page:], has_previous, has_next
+    has_next = has_next or len(rows) > per_page
+    return rows[:per_page], has_previous, has_next
+
+
+def get_merged_posts(user):
+    """Returns filter of followed posts missing in user's timeline or None.
+
+    Posts published at ``timeline_since`` may be in both, ``merge_rows``
+    shows them once.
+    """
+    merged_authors = []
+    query = Q()
+    for author_id, fan_out, since in user.follower.filter(
+        Q(fan_out=False) | Q(timeline_since__isnull=False)
+    ).values_list('author_id', 'fan_out', 'timeline_since'):
+        if fan_out:
+            query |= Q(author_id=author_id, pub_date__lte=since)
+        else:
+            merged_authors.append(author_id)
+    if merged_authors:
+        query |= Q(author__in=merged_authors)
+    return query or None
+
+
+def get_follow_page(request):
+    """Returns page of posts of the authors followed by the user."""
+    user = request.user
+    if 'page' in request.GET:
+        post_list = Post.objects.filter(
+            author__following__user=user
+        ).select_related('author', 'group')
+        return get_page(request, post_list)
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    entries = CursorPaginator(
+        TimelineEntry.objects.filter(user=user).select_related(
+            'post__author',
+            'post__group'
+        ),
+        PAGINATE_BY,
+        fields=('pub_date', 'post_id')
+    )
+    rows, has_previous, has_next = entries.get_rows(after, before)
+    sources = [([entry.post for entry in rows], has_previous, has_next)]
+    merged_posts = get_merged_posts(user)
+    if merged_posts is not None:
+        posts = CursorPaginator(
+            Post.objects.filter(merged_posts).select_related(
+                'author',
+                'group'
+            ),
+            PAGINATE_BY
+        )
+        sources.append(posts.get_rows(after, before))
+    paginator = CursorPaginator(Post.objects.none(), PAGINATE_BY)
+    return paginator.make_page(*merge_rows(sources, PAGINATE_BY, before))
@@ -7,3 +7,11 @@ def validate_not_empty(value):
             'Обязательное для заполнения поле.',
             params={'value': value},
         )
+
+
+def find_empty(values):
+    """Returns positions of the values ``validate_not_empty`` rejects.
+
+    Checks a whole column at once without raising an error per value.
+    """
+    return [position for position, value in enumerate(values) if value == '']
@@ -6,44 +6,100 @@ from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.core.cache import cache
 
+from .cache import get_index_page, hydrate
+from .conditional import (POSTS_SCOPE, get_group_scope, get_post_scope,
+                          get_user_scope, render_conditional)
 from .forms import CommentForm, PostForm
 from .models import Group, Follow, Post, User
+from .paginator import CursorPaginator, get_page
+from .search import SearchResults
+from .timeline import get_follow_page
 
 
 POST_EDIT = True
 PAGINATE_BY = settings.PAGINATE_BY
-CACHED_TIME = settings.CACHED_TIME
+COMMENTS_PAGINATE_BY = settings.COMMENTS_PAGINATE_BY
+
+
+def get_author_card(request, author):
+    """Returns counters and follow state shown on the author's card."""
+    user = request.user
+    return {
+        'followers_count': author.following.count(),
+        'follows_count': author.follower.count(),
+        'posts_count': author.posts.count(),
+        'following': (
+            user.is_authenticated
+            and author.following.filter(user=user).exists()
+        ),
+    }
+
+
+def get_comments_page(request, post):
+    """Returns page of post's comments following ``?after=`` token.
+
+    Comments are paginated by ``(created, pk)`` keyset, so every page is a
+    single query joined with the authors whatever the number of comments.
+    """
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PAGINATE_BY,
+        fields=('created', 'pk')
+    )
+    return paginator.get_cursor_page(request.GET.get('after'))
 
 
 def index(request):
     """Displays to the home page all posts."""
-    post_list = cache.get('post_list')
-    if not post_list:
-        post_list = Post.objects.select_related('group').all()
-        cache.set('post_list', post_list, CACHED_TIME)
-    paginator = Paginator(post_list, PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {
-        'page': page,
-    }
-    return render(request, 'posts/index.html', context)
+    def get_context():
+        return {
+            'page': get_index_page(request.GET),
+        }
+
+    return render_conditional(
+        request,
+        'posts/index.html',
+        get_context,
+        (POSTS_SCOPE,)
+    )
 
 
 def group_posts(request, slug):
     """Displays to the group's page all posts."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+
+    def get_context():
+        post_list = group.posts.select_related('author', 'group')
+        return {
+            'page': get_page(request, post_list),
+            'group': group,
+        }
+
+    return render_conditional(
+        request,
+        'posts/group.html',
+        get_context,
+        (get_group_scope(group.pk),),
+        group.title,
+        group.description
+    )
+
+
+def search(request):
+    """Displays posts matching the search query."""
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), PAGINATE_BY)
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = hydrate(
+        Post.objects.select_related('author', 'group'),
+        page.object_list
+    )
     context = {
         'page': page,
-        'group': group,
+        'query': query,
     }
-    return render(request, 'posts/group.html', context)
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
@@ -64,35 +120,60 @@ def new_post(request):
 def profile(request, username):
     """Displays given user's profile."""
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {
-        'author': author,
-        'page': page,
-    }
-    return render(request, 'posts/profile.html', context)
+
+    def get_context():
+        post_list = author.posts.select_related('author', 'group')
+        return {
+            'author': author,
+            'page': get_page(request, post_list),
+            **get_author_card(request, author),
+        }
+
+    return render_conditional(
+        request,
+        'posts/profile.html',
+        get_context,
+        (get_user_scope(author.pk),),
+        author.get_full_name()
+    )
 
 
 def post_view(request, username, post_id):
     """Displays post with id."""
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id, author=author)
-    form = CommentForm()
-    context = {
-        'post': post,
-        'author': author,
-        'form': form,
-    }
-    return render(request, 'posts/post.html', context)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        pk=post_id,
+        author=author
+    )
+
+    def get_context():
+        return {
+            'post': post,
+            'author': author,
+            'form': CommentForm(),
+            'comments': get_comments_page(request, post),
+            **get_author_card(request, author),
+        }
+
+    return render_conditional(
+        request,
+        'posts/post.html',
+        get_context,
+        (get_post_scope(post.pk), get_user_scope(author.pk)),
+        author.get_full_name()
+    )
 
 
 @login_required
 def add_comment(request, username, post_id):
     """Displays new comment add form."""
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id, author=author)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        pk=post_id,
+        author=author
+    )
     form = CommentForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         new_comment = form.save(commit=False)
@@ -104,10 +185,37 @@ def add_comment(request, username, post_id):
         'post': post,
         'author': author,
         'form': form,
+        'comments': get_comments_page(request, post),
+        **get_author_card(request, author),
     }
     return render(request, 'posts/post.html', context)
 
 
+def post_comments(request, username, post_id):
+    """Displays next page of post's comments loaded by the post page."""
+    post = get_object_or_404(
+        Post.objects.select_related('author').only(
+            'updated', 'author', 'author__username'
+        ),
+        pk=post_id,
+        author__username=username
+    )
+
+    def get_context():
+        return {
+            'post': post,
+            'author': post.author,
+            'comments': get_comments_page(request, post),
+        }
+
+    return render_conditional(
+        request,
+        'includes/comment_list.html',
+        get_context,
+        (get_post_scope(post.pk),)
+    )
+
+
 def post_edit(request, username, post_id):
     """Displays edit form for post with id."""
     user = get_object_or_404(User, username=username)
@@ -157,10 +265,7 @@ def profile_unfollow(request, username):
 def follow_index(request):
     """Displays posts of authors whom user follow."""
 
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, PAGINATE_BY)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_follow_page(request)
     context = {
         'page': page,
     }
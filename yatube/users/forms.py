@@ -1,11 +1,21 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
 
 
 User = get_user_model()
+RESERVED_USERNAMES = settings.RESERVED_USERNAMES
+RESERVED_USERNAME = 'Это имя пользователя занято адресом страницы сайта.'
 
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username.lower() in RESERVED_USERNAMES:
+            raise ValidationError(RESERVED_USERNAME, code='reserved')
+        return username
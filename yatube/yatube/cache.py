@@ -0,0 +1,267 @@
+"""SQLite cache backend shared by all worker processes of a host.
+
+Entries live in a single SQLite database in WAL mode, so gunicorn workers
+see each other's writes and invalidations without an external server.
+Reads don't block writers, every change runs in its own transaction and
+read-modify-write operations (``add``, ``incr``) take the write lock with
+``BEGIN IMMEDIATE`` to stay atomic across processes.
+
+When the number of entries exceeds ``MAX_ENTRIES`` expired entries are
+removed first, then ``1 / CULL_FREQUENCY`` of the least recently used
+ones. The access time is refreshed at most once per
+``ACCESS_RESOLUTION`` seconds so that reads rarely have to write, and a
+read doesn't fail when the refresh can't get the write lock.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+ACCESS_RESOLUTION = 1
+BUSY_TIMEOUT = 5000
+CULL_EVERY = 64
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, '
+    'value BLOB NOT NULL, '
+    'expires REAL, '
+    'accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Cache backend storing entries in the SQLite file at ``LOCATION``."""
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._location = location
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    @property
+    def _connection(self):
+        # Connections must not be shared between threads or survive fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._location,
+                timeout=BUSY_TIMEOUT / 1000,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT}')
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _write(self):
+        """Returns context manager running a transaction holding write lock."""
+        return _Transaction(self._connection)
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _live(self, row, now):
+        return row is not None and (row[1] is None or row[1] > now)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        row = self._connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if not self._live(row, now):
+            return default
+        if now - row[2] > ACCESS_RESOLUTION:
+            self._touch_accessed(key, now)
+        return pickle.loads(row[0])
+
+    def _touch_accessed(self, key, now):
+        # A busy database delays the refresh, not the read: the entry only
+        # becomes more likely to be culled.
+        connection = self._connection
+        connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                (now, key)
+            )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            connection.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT}')
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._connection.execute(
+            'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+            % ', '.join('?' * len(keys)),
+            list(keys)
+        ).fetchall()
+        return {
+            keys[key]: pickle.loads(value)
+            for key, value, expires in rows
+            if expires is None or expires > now
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._dumps(value), expires, now))
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+        self._written(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now)
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._dumps(value), expires, now)
+            ).rowcount == 1
+        if added:
+            self._written(1)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if not self._live(row, now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._dumps(value), now, key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time())
+            ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (key,)
+        ).fetchone()
+        return self._live(row, time.time())
+
+    def delete(self, key, version=None):
+        return bool(self.delete_many([key], version))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        if not keys:
+            return 0
+        with self._write() as connection:
+            return connection.execute(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(keys)),
+                keys
+            ).rowcount
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def _written(self, count):
+        with self._writes_lock:
+            self._writes += count
+            cull = self._writes >= CULL_EVERY
+            if cull:
+                self._writes = 0
+        if cull:
+            self._cull()
+
+    def _cull(self):
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?',
+                (time.time(),)
+            )
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+                return
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?'
+                ')',
+                (count // self._cull_frequency,)
+            )
+
+
+class _Transaction:
+    """Runs statements of the block in one ``BEGIN IMMEDIATE`` transaction."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
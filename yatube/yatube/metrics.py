@@ -0,0 +1,358 @@
+"""Application metrics in the Prometheus text format.
+
+Counters and histograms are kept in the memory of every process and copied
+to the SQLite database at ``METRICS_LOCATION`` by a background thread every
+``FLUSH_INTERVAL`` seconds and when the process exits, so requests never
+wait for the database. Every process writes only its own rows and
+``/metrics`` adds up the rows of all of them, so the gunicorn workers of a
+host are reported as one application. Numbers of other workers may be
+``FLUSH_INTERVAL`` old.
+
+``/metrics`` is served only to requests bearing ``METRICS_TOKEN`` in the
+``Authorization: Bearer`` header and is not found when no token is set.
+
+Rows of processes which exited are folded into one set by the next process
+opening the database: restarted workers neither lose their counts nor grow
+the table.
+"""
+import atexit
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from .cache import _Transaction
+
+
+METRICS_TOKEN = settings.METRICS_TOKEN
+FLUSH_INTERVAL = 1
+BUSY_TIMEOUT = 5000
+RETIRED = 'retired'
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    'process TEXT NOT NULL, '
+    'name TEXT NOT NULL, '
+    'labels TEXT NOT NULL, '
+    'value REAL NOT NULL, '
+    'PRIMARY KEY (process, name, labels)'
+    ') WITHOUT ROWID'
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+logger = logging.getLogger(__name__)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '{}="{}"'.format(
+            name,
+            value.replace('\\', r'\\').replace('"', r'\"').replace(
+                '\n',
+                r'\n'
+            )
+        )
+        for name, value in labels
+    )
+
+
+def is_running(process):
+    """Tells if the process writing rows under key ``process`` is alive."""
+    pid = int(process.partition(':')[0])
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Values of the metrics of this process and the database of all."""
+
+    def __init__(self, location):
+        self.location = location
+        self.metrics = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.local = threading.local()
+        self.pid = None
+        self.reset()
+        os.register_at_fork(
+            before=self.before_fork,
+            after_in_parent=self.after_fork_in_parent,
+            after_in_child=self.after_fork_in_child
+        )
+
+    def reset(self):
+        # Values inherited from the parent process are the parent's and
+        # threads don't survive fork.
+        self.values = defaultdict(float)
+        self.changed = set()
+        self.flusher = None
+        self.pid = os.getpid()
+        self.process = f'{self.pid}:{time.time()}'
+
+    def before_fork(self):
+        # A lock held by another thread, or SQLite's own mutexes taken by a
+        # flush, would never be released in the child.
+        self.flush_lock.acquire()
+        self.lock.acquire()
+
+    def after_fork_in_parent(self):
+        self.lock.release()
+        self.flush_lock.release()
+
+    def after_fork_in_child(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    @property
+    def connection(self):
+        # Connections must not be shared between threads or survive fork.
+        local = self.local
+        if getattr(local, 'key', None) != (self.pid, self.location):
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.location,
+                timeout=BUSY_TIMEOUT / 1000,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT}')
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute(SCHEMA)
+            self.retire(connection)
+            local.connection = connection
+            local.key = (self.pid, self.location)
+        return local.connection
+
+    def retire(self, connection):
+        """Folds rows of exited processes into the ``RETIRED`` ones."""
+        processes = [
+            process for process, in connection.execute(
+                'SELECT DISTINCT process FROM metrics WHERE process != ?',
+                (RETIRED,)
+            )
+            if not is_running(process)
+        ]
+        if not processes:
+            return
+        with _Transaction(connection):
+            for process in processes:
+                connection.execute(
+                    'INSERT INTO metrics (process, name, labels, value) '
+                    'SELECT ?, name, labels, value FROM metrics '
+                    'WHERE process = ? '
+                    'ON CONFLICT (process, name, labels) '
+                    'DO UPDATE SET value = value + excluded.value',
+                    (RETIRED, process)
+                )
+                connection.execute(
+                    'DELETE FROM metrics WHERE process = ?',
+                    (process,)
+                )
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def add(self, changes):
+        """Adds ``((name, labels), amount)`` changes to the values."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            for key, amount in changes:
+                self.values[key] += amount
+                self.changed.add(key)
+            if self.flusher is None:
+                self.flusher = threading.Thread(
+                    target=self.flush_periodically,
+                    args=(self.pid,),
+                    name='metrics-flusher',
+                    daemon=True
+                )
+                self.flusher.start()
+
+    def flush_periodically(self, pid):
+        while self.pid == pid:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Writes values changed since the last flush to the database."""
+        # A thread already flushing writes the changes made so far.
+        if not self.flush_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                changed = self.changed
+                rows = [
+                    (self.process, name, json.dumps(labels), self.values[
+                        (name, labels)
+                    ])
+                    for name, labels in changed
+                ]
+                self.changed = set()
+            if not rows:
+                return
+            try:
+                with _Transaction(self.connection) as connection:
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO metrics '
+                        '(process, name, labels, value) VALUES (?, ?, ?, ?)',
+                        rows
+                    )
+            except sqlite3.Error:
+                # Metrics must not break the request, the values are
+                # written by the next flush.
+                logger.warning('Metrics were not flushed', exc_info=True)
+                with self.lock:
+                    self.changed.update(changed)
+        finally:
+            self.flush_lock.release()
+
+    def collect(self):
+        """Returns the values of all processes in the text format."""
+        self.flush()
+        totals = defaultdict(dict)
+        for name, labels, value in self.connection.execute(
+            'SELECT name, labels, SUM(value) FROM metrics '
+            'GROUP BY name, labels'
+        ):
+            totals[name][tuple(map(tuple, json.loads(labels)))] = value
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.get_samples(totals):
+                lines.append(
+                    f'{name}{format_labels(labels)} {format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry(settings.METRICS_LOCATION)
+atexit.register(registry.flush)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        registry.register(self)
+
+    def get_labels(self, labels):
+        return tuple((name, str(labels[name])) for name in self.label_names)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        registry.add([((self.name, self.get_labels(labels)), amount)])
+
+    def get_samples(self, totals):
+        for labels, value in sorted(totals[self.name].items()):
+            yield self.name, labels, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        labels = self.get_labels(labels)
+        changes = [
+            ((f'{self.name}_bucket', labels + (('le', format_value(bound)),)),
+             1)
+            for bound in self.buckets if value <= bound
+        ]
+        changes.append(((f'{self.name}_sum', labels), value))
+        changes.append(((f'{self.name}_count', labels), 1))
+        registry.add(changes)
+
+    def get_samples(self, totals):
+        buckets = totals[f'{self.name}_bucket']
+        for labels, count in sorted(totals[f'{self.name}_count'].items()):
+            # Buckets are cumulative, the ones no value fell into are 0.
+            for bound in self.buckets:
+                le = labels + (('le', format_value(bound)),)
+                yield f'{self.name}_bucket', le, buckets.get(le, 0)
+            yield f'{self.name}_sum', labels, totals[f'{self.name}_sum'].get(
+                labels,
+                0
+            )
+            yield f'{self.name}_count', labels, count
+
+
+REQUESTS = Counter(
+    'yatube_http_requests_total',
+    'Requests served by view.',
+    ('view', 'method', 'status')
+)
+REQUEST_DURATION = Histogram(
+    'yatube_http_request_duration_seconds',
+    'Time to serve a request by view.',
+    ('view',),
+    DURATION_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'yatube_http_request_db_queries',
+    'Database queries made by a request by view.',
+    ('view',),
+    QUERY_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    'yatube_cache_lookups_total',
+    'Keys looked up in the default cache by result, hit or miss.',
+    ('result',)
+)
+THUMBNAILS_GENERATED = Counter(
+    'yatube_thumbnails_generated_total',
+    'Thumbnails and image variants generated.'
+)
+POSTS_CREATED = Counter('yatube_posts_created_total', 'Posts created.')
+COMMENTS_CREATED = Counter(
+    'yatube_comments_created_total',
+    'Comments created.'
+)
+
+
+def metrics_view(request):
+    """Serves the metrics of all processes to Prometheus."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(
+        ' '
+    )
+    # compare_digest takes only ASCII strings, headers may carry anything.
+    if not METRICS_TOKEN or scheme != 'Bearer' or not hmac.compare_digest(
+        token.encode(),
+        METRICS_TOKEN.encode()
+    ):
+        raise Http404
+    return HttpResponse(registry.collect(), content_type=CONTENT_TYPE)
@@ -0,0 +1,271 @@
+"""Per-request performance instrumentation.
+
+A sample of requests (``TIMING_SAMPLE_RATE``, none unless it is set in the
+environment) is measured: the number and time of database queries, cache
+hits, misses and time, template rendering time, time spent looking up sorl
+thumbnails and the total time. The measurements are logged as one JSON line
+by the ``yatube.timing`` logger and sent to staff users in the
+``Server-Timing`` header, shown by browser developer tools next to the
+request.
+
+Methods of the cache backend, the template backend and the thumbnail
+key-value store are wrapped once, when the middleware is created. Outside
+of sampled requests the wrappers only look at a thread-local, but cache
+hits and misses of every lookup are counted for ``yatube.metrics``. Nested
+calls of the same kind, such as ``get_many`` made of ``get`` calls, are
+timed and counted once.
+
+``MetricsMiddleware`` records every request in ``yatube.metrics``: its
+view, status, duration and number of database queries.
+"""
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.functional import empty
+from sorl.thumbnail import default
+
+from .metrics import (CACHE_LOOKUPS, REQUEST_DURATION, REQUEST_QUERIES,
+                      REQUESTS)
+
+
+TIMING_SAMPLE_RATE = settings.TIMING_SAMPLE_RATE
+CACHE_METHODS = (
+    'add', 'get', 'set', 'touch', 'delete', 'get_many', 'has_key', 'incr',
+    'set_many', 'delete_many', 'get_or_set',
+)
+THUMBNAIL_METHODS = ('get', 'get_or_set', 'preload')
+# View label of requests no URL pattern matched.
+UNMATCHED = 'unmatched'
+# Server-Timing metric names in the order they are sent.
+KINDS = ('db', 'cache', 'template', 'thumbnails')
+
+logger = logging.getLogger('yatube.timing')
+local = threading.local()
+
+
+class Timing:
+    """Measurements of the request being served."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.running = set()
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def measure_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations['db'] += time.perf_counter() - started
+
+
+def get_timing():
+    """Returns measurements of the current request if it is sampled."""
+    return getattr(local, 'timing', None)
+
+
+def measured(kind, method):
+    """Wraps method to add its time to ``kind`` of the sampled request."""
+    if getattr(method, 'measured', False):
+        return method
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        timing = get_timing()
+        if timing is None or kind in timing.running:
+            return method(*args, **kwargs)
+        timing.running.add(kind)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timing.running.discard(kind)
+            timing.durations[kind] += time.perf_counter() - started
+
+    wrapper.measured = True
+    return wrapper
+
+
+def count_lookups(hits, misses):
+    timing = get_timing()
+    if timing is not None:
+        timing.cache_hits += hits
+        timing.cache_misses += misses
+    if hits:
+        CACHE_LOOKUPS.inc(hits, result='hit')
+    if misses:
+        CACHE_LOOKUPS.inc(misses, result='miss')
+
+
+def counted_get(get):
+    """Wraps cache ``get`` to count hits and misses."""
+    @functools.wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        # Lookups made by another lookup, such as the inherited get_many,
+        # are counted by it.
+        if getattr(local, 'counting', False):
+            return get(self, key, default, version)
+        local.counting = True
+        try:
+            value = get(self, key, default, version)
+        finally:
+            local.counting = False
+        if value is default:
+            count_lookups(0, 1)
+        else:
+            count_lookups(1, 0)
+        return value
+    return wrapper
+
+
+def counted_get_many(get_many):
+    """Wraps cache ``get_many`` to count hits and misses."""
+    @functools.wraps(get_many)
+    def wrapper(self, keys, version=None):
+        if getattr(local, 'counting', False):
+            return get_many(self, keys, version)
+        keys = list(keys)
+        local.counting = True
+        try:
+            values = get_many(self, keys, version)
+        finally:
+            local.counting = False
+        count_lookups(len(values), len(keys) - len(values))
+        return values
+    return wrapper
+
+
+def wrap_methods(cls, names, kind, wrappers=None):
+    for name in names:
+        method = getattr(cls, name, None)
+        if method is None or getattr(method, 'measured', False):
+            continue
+        method = measured(kind, method)
+        # Counting wrappers go outside to see if the call is nested.
+        if wrappers and name in wrappers:
+            method = wrappers[name](method)
+        setattr(cls, name, method)
+
+
+def get_kvstore_class():
+    """Returns class of the thumbnail store behind sorl's lazy object."""
+    kvstore = default.kvstore
+    if kvstore._wrapped is empty:
+        kvstore._setup()
+    return type(kvstore._wrapped)
+
+
+def instrument():
+    """Wraps the measured methods, calling it again changes nothing."""
+    wrap_methods(type(caches['default']), CACHE_METHODS, 'cache', {
+        'get': counted_get,
+        'get_many': counted_get_many,
+    })
+    wrap_methods(Template, ('render',), 'template')
+    wrap_methods(get_kvstore_class(), THUMBNAIL_METHODS, 'thumbnails')
+
+
+class TimingMiddleware:
+    """Measures a sample of requests, see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        if random.random() >= TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        timing = local.timing = Timing()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.measure_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            local.timing = None
+        total = time.perf_counter() - timing.started
+        user = getattr(request, 'user', None)
+        # The timings tell how pages are built, strangers don't get them.
+        if user is not None and user.is_staff:
+            self.send_timing(response, timing, total)
+        if logger.isEnabledFor(logging.INFO):
+            match = request.resolver_match
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_queries': timing.queries,
+                'cache_hits': timing.cache_hits,
+                'cache_misses': timing.cache_misses,
+                **{
+                    f'{kind}_ms': round(timing.durations[kind] * 1000, 1)
+                    for kind in KINDS
+                },
+            }))
+        return response
+
+    def send_timing(self, response, timing, total):
+        response['Server-Timing'] = ', '.join(
+            [
+                f'db;dur={timing.durations["db"] * 1000:.1f};'
+                f'desc="{timing.queries} queries"',
+                f'cache;dur={timing.durations["cache"] * 1000:.1f};'
+                f'desc="{timing.cache_hits} hits, '
+                f'{timing.cache_misses} misses"',
+            ]
+            + [
+                f'{kind};dur={timing.durations[kind] * 1000:.1f}'
+                for kind in KINDS[2:]
+            ]
+            + [f'total;dur={total * 1000:.1f}']
+        )
+
+
+class MetricsMiddleware:
+    """Records every request in the application metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else UNMATCHED
+        REQUESTS.inc(
+            view=view,
+            method=request.method,
+            status=response.status_code
+        )
+        REQUEST_DURATION.observe(time.perf_counter() - started, view=view)
+        REQUEST_QUERIES.observe(queries, view=view)
+        return response
@@ -23,6 +23,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.middleware.MetricsMiddleware',
+    'yatube.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -113,15 +115,80 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 LOGIN_URL = '/auth/login/'
 
 LOGIN_REDIRECT_URL = 'index'
+# Profiles live at /<username>/, these names are taken by the site pages.
+RESERVED_USERNAMES = (
+    '__debug__',
+    'about',
+    'admin',
+    'api',
+    'auth',
+    'follow',
+    'group',
+    'media',
+    'metrics',
+    'new',
+    'search',
+    'static',
+)
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PAGINATE_BY = 10
+COMMENTS_PAGINATE_BY = 20
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
-CACHED_TIME = 20
+# Tests run against temporary caches, see yatube/test_runner.py.
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
+FEED_CACHE_TIMEOUT = 60 * 60
+CACHE_STALE_TIMEOUT = 60
+CACHE_LOCK_TIMEOUT = 5
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL = 1000
+SEARCH_CONFIG = 'russian'
+ESTIMATED_COUNT_THRESHOLD = 100000
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+IMAGE_MAX_SIZE = 2560
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_LRU_SIZE = 10000
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+# Requests are measured only where the environment asks for it.
+TIMING_SAMPLE_RATE = float(os.getenv('TIMING_SAMPLE_RATE', 0))
+METRICS_LOCATION = os.getenv(
+    'METRICS_LOCATION',
+    os.path.join(BASE_DIR, 'cache', 'metrics.sqlite3')
+)
+# /metrics is not found unless requested with this bearer token.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.timing': {
+            'handlers': ['timing'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,49 @@
+"""Test runner keeping the caches and metrics of the tests apart.
+
+The tests clear the cache and count their requests, so the cache and
+metrics databases of the project, shared by the development server and the
+management commands, are replaced by temporary ones while they run.
+"""
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import metrics
+
+
+@contextmanager
+def override_storage(directory):
+    """Moves every cache and the metrics database to directory."""
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, options in caches.items():
+        options['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+    registry = metrics.registry
+    location = registry.location
+    registry.location = os.path.join(directory, 'metrics.sqlite3')
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        # Values counted so far belong to the tests.
+        registry.flush()
+        registry.location = location
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.storage_directory = tempfile.mkdtemp()
+        self.storage = ExitStack()
+        self.storage.enter_context(override_storage(self.storage_directory))
+
+    def teardown_test_environment(self, **kwargs):
+        self.storage.close()
+        shutil.rmtree(self.storage_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,97 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from yatube.cache import SQLiteCache, _Transaction
+
+
+def incr_in_process(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertEqual(
+            self.cache.get_many(['key', 'missing']),
+            {'key': {'value': [1, 2]}}
+        )
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_timeout(self):
+        """Просроченные значения не возвращаются."""
+        self.cache.set('key', 'value', 0.01)
+        self.assertTrue(self.cache.add('forever', 'value', None))
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('forever', 'other'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_get_while_database_is_locked(self):
+        """Чтение не ждет и не падает, когда базу держит писатель."""
+        self.cache.set('key', 'value')
+        writer = SQLiteCache(self.location, {})
+        with mock.patch('yatube.cache.ACCESS_RESOLUTION', -1):
+            with _Transaction(writer._connection):
+                started = time.monotonic()
+                self.assertEqual(self.cache.get('key'), 'value')
+                self.assertLess(time.monotonic() - started, 1)
+
+    def test_incr(self):
+        """incr увеличивает число и падает на отсутствующем ключе."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_processes(self):
+        """Процессы видят общие значения и атомарно их увеличивают."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(
+                target=incr_in_process,
+                args=(self.location, 50)
+            )
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_least_recently_used_entries_culled(self):
+        """При переполнении удаляются давно не читанные значения."""
+        cache = SQLiteCache(
+            self.location,
+            {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}}
+        )
+        for number in range(11):
+            cache.set(f'key_{number}', number)
+        cache._connection.execute(
+            "UPDATE cache SET accessed = 0 WHERE key LIKE '%key_1%'"
+        )
+        cache._cull()
+        self.assertIsNone(cache.get('key_1'))
+        self.assertIsNone(cache.get('key_10'))
+        self.assertEqual(cache.get('key_9'), 9)
@@ -0,0 +1,122 @@
+import multiprocessing
+import shutil
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import metrics
+
+TOKEN = 'secret'
+# The registry of the tests, setUp replaces it by a separate one.
+TESTS_REGISTRY = metrics.registry
+
+
+def create_posts_in_process(count):
+    metrics.POSTS_CREATED.inc(count)
+    metrics.registry.flush()
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = metrics.Registry(f'{self.directory}/metrics.sqlite3')
+        self.registry.metrics = metrics.registry.metrics
+        patcher = mock.patch.object(metrics, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_processes_are_added_up(self):
+        """Метрики всех процессов складываются и не теряются после них."""
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=create_posts_in_process, args=(3,))
+            for _ in range(2)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        metrics.POSTS_CREATED.inc()
+        line = 'yatube_posts_created_total 7.0'
+        self.assertIn(line, self.registry.collect())
+        restarted = metrics.Registry(self.registry.location)
+        restarted.metrics = self.registry.metrics
+        self.assertIn(line, restarted.collect())
+        processes = {
+            process for process, in restarted.connection.execute(
+                'SELECT DISTINCT process FROM metrics'
+            )
+        }
+        self.assertEqual(
+            processes,
+            {metrics.RETIRED, self.registry.process}
+        )
+
+    def test_metrics_page(self):
+        """Страница /metrics отдает метрики запросов в формате Prometheus."""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Тестовый текст поста', author=author)
+        self.client.get(reverse('index'))
+        with mock.patch.object(metrics, 'METRICS_TOKEN', TOKEN):
+            response = self.client.get(
+                reverse('metrics'),
+                HTTP_AUTHORIZATION=f'Bearer {TOKEN}'
+            )
+        self.assertEqual(
+            response['Content-Type'],
+            metrics.CONTENT_TYPE
+        )
+        content = response.content.decode()
+        for line in (
+            '# TYPE yatube_http_request_duration_seconds histogram',
+            'yatube_http_requests_total'
+            '{view="index",method="GET",status="200"} 1.0',
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="index",le="+Inf"} 1.0',
+            'yatube_http_request_db_queries_count{view="index"} 1.0',
+            'yatube_posts_created_total 1.0',
+            'yatube_cache_lookups_total{result="miss"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, content)
+
+    def test_metrics_page_requires_token(self):
+        """Страница /metrics недоступна без токена и с чужим токеном."""
+        for token, header in (
+            ('', 'Bearer '),
+            (TOKEN, ''),
+            (TOKEN, 'Bearer wrong'),
+            (TOKEN, f'Basic {TOKEN}'),
+            (TOKEN, 'Bearer секрет'),
+        ):
+            with self.subTest(token=token, header=header):
+                with mock.patch.object(metrics, 'METRICS_TOKEN', token):
+                    response = self.client.get(
+                        reverse('metrics'),
+                        HTTP_AUTHORIZATION=header
+                    )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_requests_dont_flush(self):
+        """Запросы не пишут метрики в базу, это делает фоновый поток."""
+        with mock.patch.object(metrics, 'FLUSH_INTERVAL', 60), \
+                mock.patch.object(self.registry, 'flush') as flush:
+            self.client.get(reverse('index'))
+        flush.assert_not_called()
+        self.assertTrue(self.registry.flusher.is_alive())
+
+    def test_tests_dont_write_project_metrics(self):
+        """Тесты пишут метрики во временную базу, а не в базу проекта."""
+        self.assertNotEqual(
+            TESTS_REGISTRY.location,
+            settings.METRICS_LOCATION
+        )
@@ -0,0 +1,89 @@
+import json
+import re
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+POST_TEXT = 'Тестовый текст поста'
+IMAGE_NAME = 'small.gif'
+IMAGE_CONTENT_TYPE = 'image/gif'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class TimingMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text=POST_TEXT, author=cls.author)
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(TimingMiddlewareTest.staff)
+        cache.clear()
+
+    @mock.patch('yatube.middleware.TIMING_SAMPLE_RATE', 1)
+    def test_sampled_request_is_measured(self):
+        """Выбранный запрос получает Server-Timing и строку в журнале."""
+        with self.assertLogs('yatube.timing') as logs:
+            response = self.staff_client.get(reverse('index'))
+        header = response['Server-Timing']
+        for metric in ('db;', 'cache;', 'template;', 'thumbnails;', 'total;'):
+            self.assertIn(metric, header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIn(f'desc="{record["db_queries"]} queries"', header)
+
+    @mock.patch('yatube.middleware.TIMING_SAMPLE_RATE', 0)
+    def test_other_requests_are_not_measured(self):
+        """Невыбранные запросы не измеряются."""
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', response)
+
+    @mock.patch('yatube.middleware.TIMING_SAMPLE_RATE', 1)
+    def test_timing_header_sent_to_staff_only(self):
+        """Заголовок Server-Timing получают только сотрудники."""
+        with self.assertLogs('yatube.timing'):
+            response = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', response)
+
+    @mock.patch('yatube.middleware.TIMING_SAMPLE_RATE', 1)
+    def test_thumbnail_lookups_are_measured(self):
+        """Время поиска миниатюр попадает в Server-Timing."""
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                # Until the variants are made the thumbnail is looked up.
+                Post.objects.create(
+                    text=POST_TEXT,
+                    author=TimingMiddlewareTest.author,
+                    image=SimpleUploadedFile(
+                        name=IMAGE_NAME,
+                        content=SMALL_GIF,
+                        content_type=IMAGE_CONTENT_TYPE
+                    )
+                )
+                with self.assertLogs('yatube.timing'):
+                    response = self.staff_client.get(reverse('index'))
+        durations = dict(
+            re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing'])
+        )
+        self.assertGreater(float(durations['thumbnails']), 0)